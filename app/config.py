@@ -1,10 +1,60 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import os
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
     DATABASE_URL: str
     IMGUR_CLIENT_ID: str
 
+    # Number of rows fetched per server-side cursor batch (and written per row group) on export
+    EXPORT_BATCH_SIZE: int = 10000
+
+    # Point clustering: grid cells per map tile edge, the most cells one request may group by,
+    # and cache limits for cluster results
+    CLUSTER_CELLS_PER_TILE: int = 8
+    CLUSTER_MAX_CELLS: int = 65536
+    CLUSTER_CACHE_TTL_SECONDS: float = 60.0
+    CLUSTER_CACHE_MAX_ENTRIES: int = 1024
+
+    # Cache for /spatial/polygon-stats results, 0 disables it
+    POLYGON_STATS_CACHE_TTL_SECONDS: float = 60.0
+    POLYGON_STATS_CACHE_MAX_ENTRIES: int = 256
+
+    # Encode list and spatial responses straight from database rows with orjson,
+    # skipping per-row response models and response_model validation
+    FAST_JSON_RESPONSES: bool = False
+
+    # Group commit for POST /points/: creates arriving within the window (or until the batch
+    # is full) are written with one multi-row INSERT and one commit
+    POINT_WRITE_BATCHING: bool = False
+    POINT_BATCH_WINDOW_MS: float = 5.0
+    POINT_BATCH_MAX_SIZE: int = 500
+
+    # Evaluate geofence enter/exit events on every point create/update and NOTIFY them to all
+    # server processes (off by default, it adds work to every point write), and how many events
+    # are buffered per subscriber before the oldest are dropped
+    GEOFENCE_EVENTS: bool = False
+    GEOFENCE_SUBSCRIBER_QUEUE_SIZE: int = 1000
+
+    # Load matplotlib/GeoPandas/Pillow during startup instead of on the first image request
+    PREWARM_RENDERING: bool = False
+
+    # Level of the app.* loggers (startup timings, diagnostics, maintenance)
+    LOG_LEVEL: str = "INFO"
+
+    # Request diagnostics: warn when a request runs more statements than the budget, or the same
+    # statement this many times (N+1). Requests sending PROFILING_TOKEN (X-Profile header or
+    # ?profile=) are profiled; profiles go to PROFILE_OUTPUT_DIR if set, else replace the response.
+    QUERY_BUDGET: int = 20
+    N_PLUS_ONE_THRESHOLD: int = 5
+    PROFILING_TOKEN: Optional[str] = None
+    PROFILE_OUTPUT_DIR: Optional[str] = None
+
+    # Scheduled storage maintenance: re-cluster points by this key and ANALYZE every N hours.
+    # Disabled by default, CLUSTER locks the points table while it rewrites it.
+    STORAGE_MAINTENANCE_INTERVAL_HOURS: Optional[float] = None
+    STORAGE_CLUSTER_KEY: Literal["geohash", "gist"] = "geohash"
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 def get_settings():
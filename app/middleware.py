@@ -0,0 +1,223 @@
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import secrets
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import parse_qs
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config import settings
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # pyinstrument is optional, profiles fall back to cProfile
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "profile"
+
+class QueryStats:
+    """SQL statements run while handling one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated_statements(self, threshold: int):
+        """Statements run at least `threshold` times, the usual sign of an N+1 query pattern"""
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# The start time lives on the execution context, which is discarded with the statement,
+# so a statement that fails leaves nothing behind on the connection
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started_at = time.perf_counter()
+
+def _record_statement(statement: str, context):
+    stats = _query_stats.get()
+    started_at = getattr(context, "_query_started_at", None)
+    if stats is not None and started_at is not None:
+        stats.record(statement, time.perf_counter() - started_at)
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_statement(statement, context)
+
+def _handle_error(exception_context):
+    # Failed statements count against the budget too
+    if exception_context.execution_context is not None and exception_context.statement is not None:
+        _record_statement(exception_context.statement, exception_context.execution_context)
+
+def install_query_counter(engine: Engine):
+    """Count statements and their time per request; pass `async_engine.sync_engine` for async engines"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def _profile_requested(scope) -> bool:
+    """Only profile when the request carries the configured token, in a header or the query string"""
+    token = settings.PROFILING_TOKEN
+    if not token:
+        return False
+    supplied = dict(scope["headers"]).get(PROFILE_HEADER.encode("latin-1"), b"").decode("latin-1")
+    if not supplied:
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        supplied = query.get(PROFILE_QUERY_PARAM, [""])[0]
+    return bool(supplied) and secrets.compare_digest(supplied, token)
+
+# Both profilers hook the event loop thread and a second one would take over the first one's hook,
+# so profiled requests run one at a time
+_profiling_lock = asyncio.Lock()
+
+class _RequestProfiler:
+    """pyinstrument when it is installed, otherwise cProfile"""
+
+    def __init__(self):
+        if Profiler is not None:
+            # async_mode only attributes time to this request's task, not the whole event loop
+            self._profiler = Profiler(async_mode="enabled")
+        else:
+            # cProfile sees everything on the event loop thread, including concurrent requests
+            self._profiler = cProfile.Profile()
+
+    def start(self):
+        if Profiler is not None:
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self):
+        if Profiler is not None:
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def render(self) -> tuple:
+        """Return (file extension, content type, body) for the captured profile"""
+        if Profiler is not None:
+            return "html", "text/html; charset=utf-8", self._profiler.output_html().encode("utf-8")
+        output = io.StringIO()
+        pstats.Stats(self._profiler, stream=output).sort_stats("cumulative").print_stats(50)
+        return "txt", "text/plain; charset=utf-8", output.getvalue().encode("utf-8")
+
+class RequestDiagnosticsMiddleware:
+    """
+    Adds X-Query-Count and X-Query-Time-Ms headers to every HTTP response and logs a warning
+    when a request runs more than QUERY_BUDGET statements or repeats one statement
+    N_PLUS_ONE_THRESHOLD times.
+
+    The headers are sent when the response starts, so they only cover the work done before the
+    body: for streaming responses (exports, event streams) they miss the statements run while
+    streaming. The budget warnings, and the totals logged at DEBUG level, are taken once the
+    response has finished.
+
+    Requests carrying PROFILING_TOKEN in the X-Profile header or the `profile` query parameter
+    are profiled. The profile replaces the response body, or is written to PROFILE_OUTPUT_DIR
+    with its path in the X-Profile-Path header when that setting is set. Profiled requests run
+    one at a time. Streaming responses (without a Content-Length) are not profiled: they could
+    hold up every other profiled request for as long as they stream, so profiling stops when
+    they start, and they are sent as usual with an X-Profile-Skipped header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        stats_token = _query_stats.set(stats)
+        profiler = _RequestProfiler() if _profile_requested(scope) else None
+        profiling = False
+        response_start = {}
+
+        def stop_profiling():
+            nonlocal profiling
+            if profiling:
+                profiling = False
+                profiler.stop()
+                _profiling_lock.release()
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(stats.count).encode("latin-1")))
+                headers.append((b"x-query-time-ms", f"{stats.total_seconds * 1000:.1f}".encode("latin-1")))
+                if profiling:
+                    if any(name.lower() == b"content-length" for name, _ in headers):
+                        response_start.update(message, headers=headers)
+                        return
+                    stop_profiling()
+                    headers.append((b"x-profile-skipped", b"streaming response"))
+                message = {**message, "headers": headers}
+            elif profiling:
+                # The original body is dropped, the profile is sent once the request finishes
+                return
+            await send(message)
+
+        try:
+            if profiler is None:
+                await self.app(scope, receive, send_with_stats)
+            else:
+                await _profiling_lock.acquire()
+                profiling = True
+                try:
+                    profiler.start()
+                    await self.app(scope, receive, send_with_stats)
+                finally:
+                    profiled = profiling
+                    stop_profiling()
+                if profiled:
+                    await self._send_profile(scope, profiler, response_start, send)
+        finally:
+            _query_stats.reset(stats_token)
+            self._check_budget(scope, stats)
+
+    async def _send_profile(self, scope, profiler: _RequestProfiler, response_start: dict, send):
+        extension, content_type, body = profiler.render()
+        headers = [
+            (name, value) for name, value in response_start.get("headers", [])
+            if name.lower() not in (b"content-length", b"content-type", b"content-encoding")
+        ]
+        if settings.PROFILE_OUTPUT_DIR:
+            os.makedirs(settings.PROFILE_OUTPUT_DIR, exist_ok=True)
+            timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+            endpoint = scope["path"].strip("/").replace("/", "_") or "root"
+            path = os.path.join(settings.PROFILE_OUTPUT_DIR, f"{timestamp}-{endpoint}.{extension}")
+            with open(path, "wb") as profile_file:
+                profile_file.write(body)
+            logger.info(f"Profile of {scope['method']} {scope['path']} written to {path}")
+            headers.append((b"x-profile-path", path.encode("latin-1")))
+            content_type, body = "text/plain; charset=utf-8", f"Profile written to {path}\n".encode("utf-8")
+        headers.append((b"content-type", content_type.encode("latin-1")))
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        await send({"type": "http.response.start", "status": response_start.get("status", 200), "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def _check_budget(self, scope, stats: QueryStats):
+        request = f"{scope['method']} {scope['path']}"
+        logger.debug(f"{request} ran {stats.count} SQL statements ({stats.total_seconds * 1000:.1f} ms)")
+        if stats.count > settings.QUERY_BUDGET:
+            logger.warning(
+                f"{request} ran {stats.count} SQL statements ({stats.total_seconds * 1000:.1f} ms), "
+                f"over the budget of {settings.QUERY_BUDGET}"
+            )
+        for statement, count in stats.repeated_statements(settings.N_PLUS_ONE_THRESHOLD):
+            logger.warning(f"{request} ran the same statement {count} times, possible N+1 query: {statement[:200]}")
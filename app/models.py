@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.schema import CreateIndex, DropIndex
 from geoalchemy2 import Geometry
 from sqlalchemy.dialects.postgresql import JSONB
 
@@ -13,6 +14,11 @@ class PointDB(Base):
     name = Column(String, nullable=False)
     geom = Column(Geometry("POINT", srid=4326), nullable=False)
     meta = Column(JSONB)
+
+    __table_args__ = (
+        # Serves metadata containment (@>) filters
+        Index("ix_points_meta_path_ops", meta, postgresql_using="gin", postgresql_ops={"meta": "jsonb_path_ops"}),
+    )
     
     def __repr__(self):
         return f"<Point {self.id}: {self.name}>"
@@ -25,6 +31,71 @@ class PolygonDB(Base):
     name = Column(String, nullable=False)
     geom = Column(Geometry("POLYGON", srid=4326), nullable=False)
     meta = Column(JSONB)
+
+    __table_args__ = (
+        # Serves metadata containment (@>) filters
+        Index("ix_polygons_meta_path_ops", meta, postgresql_using="gin", postgresql_ops={"meta": "jsonb_path_ops"}),
+    )
     
     def __repr__(self):
-        return f"<Polygon {self.id}: {self.name}>" 
\ No newline at end of file
+        return f"<Polygon {self.id}: {self.name}>"
+
+class PointPolygonMembershipDB(Base):
+    """SQLAlchemy model for the materialized point-in-polygon relation, maintained by the point and polygon write paths"""
+    __tablename__ = "point_polygon_membership"
+
+    # The primary key serves lookups by point, the polygon_id index lookups by polygon
+    point_id = Column(Integer, ForeignKey("points.id", ondelete="CASCADE"), primary_key=True)
+    polygon_id = Column(Integer, ForeignKey("polygons.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+    def __repr__(self):
+        return f"<PointPolygonMembership {self.point_id} in {self.polygon_id}>"
+
+def missing_tables(connection) -> set:
+    """Names of the declared tables that don't exist yet; run before create_all to know which it created"""
+    inspector = inspect(connection)
+    return {table.name for table in Base.metadata.sorted_tables if not inspector.has_table(table.name)}
+
+# Advisory lock key that keeps workers starting together from building the same indexes at once
+INDEX_BUILD_LOCK_KEY = 7_301_003
+
+def _invalid_indexes(connection, names):
+    """Names of the given indexes left invalid by a CREATE INDEX CONCURRENTLY that failed or was interrupted"""
+    result = connection.execute(
+        text("""
+            SELECT c.relname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = ANY(:names) AND NOT i.indisvalid
+        """),
+        {"names": list(names)},
+    )
+    return {row[0] for row in result}
+
+def create_missing_indexes(connection):
+    """
+    Create declared indexes that are missing, e.g. ones added after their table was first created.
+
+    Indexes are built with CREATE INDEX CONCURRENTLY IF NOT EXISTS, so building one on a large table
+    doesn't block writes. A concurrent build that fails leaves an invalid index behind, which IF NOT
+    EXISTS would then skip, so invalid indexes are dropped and built again. CONCURRENTLY can't run
+    in a transaction block: `connection` must be in AUTOCOMMIT mode.
+    """
+    indexes = [index for table in Base.metadata.sorted_tables for index in table.indexes]
+    # Held for the session, so an invalid index seen here is not another worker's build in progress
+    connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": INDEX_BUILD_LOCK_KEY})
+    try:
+        invalid = _invalid_indexes(connection, [index.name for index in indexes])
+        for index in indexes:
+            options = index.dialect_options["postgresql"]
+            concurrently = options["concurrently"]
+            # Only for these statements, create_all must keep building them inside its transaction
+            options["concurrently"] = True
+            try:
+                if index.name in invalid:
+                    connection.execute(DropIndex(index, if_exists=True))
+                connection.execute(CreateIndex(index, if_not_exists=True))
+            finally:
+                options["concurrently"] = concurrently
+    finally:
+        connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": INDEX_BUILD_LOCK_KEY})
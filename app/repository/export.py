@@ -0,0 +1,60 @@
+from typing import AsyncIterator, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func, cast, Text
+from app.models import PointDB, PolygonDB
+
+# Tables that can be exported, keyed by their public name
+EXPORT_TABLES = {
+    "points": PointDB,
+    "polygons": PolygonDB,
+}
+
+def _apply_filters(query, model, bbox: Optional[tuple], id_range: Optional[Tuple[int, int]]):
+    """Restrict an export query to a bbox and/or a half-open [start, end) id range"""
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        query = query.filter(
+            func.ST_Intersects(model.geom, func.ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326))
+        )
+    if id_range is not None:
+        start, end = id_range
+        query = query.filter(model.id >= start, model.id < end)
+    return query
+
+async def get_id_bounds(db: AsyncSession, table: str, bbox: Optional[tuple] = None) -> Optional[Tuple[int, int]]:
+    """Get the (min, max) id of the rows to export, or None if there are none"""
+    model = EXPORT_TABLES[table]
+    query = _apply_filters(select(func.min(model.id), func.max(model.id)), model, bbox, None)
+    result = await db.execute(query)
+    min_id, max_id = result.one()
+    if min_id is None:
+        return None
+    return min_id, max_id
+
+async def stream_table_rows(
+    db: AsyncSession,
+    table: str,
+    batch_size: int,
+    bbox: Optional[tuple] = None,
+    id_range: Optional[Tuple[int, int]] = None,
+) -> AsyncIterator[List[tuple]]:
+    """
+    Stream (id, name, meta, geometry) rows of a table in batches of at most batch_size.
+
+    Rows are read through a server-side cursor, so only one batch is held in memory
+    at a time. `meta` is returned as its JSON text and `geometry` as WKB bytes, which
+    avoids decoding either on the Python side.
+    """
+    model = EXPORT_TABLES[table]
+    query = select(
+        model.id,
+        model.name,
+        cast(model.meta, Text).label("meta"),
+        func.ST_AsBinary(model.geom).label("geometry"),
+    ).order_by(model.id)
+    query = _apply_filters(query, model, bbox, id_range)
+
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for rows in result.partitions(batch_size):
+        yield [tuple(row) for row in rows]
@@ -0,0 +1,49 @@
+from typing import Any, Dict, Optional
+from sqlalchemy.future import select
+from sqlalchemy import func, case, literal
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import aliased
+from app.models import PolygonDB
+
+def bbox_envelope(bbox: tuple):
+    """Build an SRID 4326 envelope from a (min_lon, min_lat, max_lon, max_lat) bbox"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return func.ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
+
+def selection_filters(model, bbox: Optional[tuple] = None, polygon_id: Optional[int] = None) -> list:
+    """
+    Build WHERE clauses selecting the rows of `model` whose geometry lies within a bbox
+    and/or within a stored polygon.
+
+    The containing polygon is resolved with a scalar subquery so the selection stays a single
+    statement; if it does not exist nothing matches. A polygon never selects itself.
+    """
+    clauses = []
+    if bbox is not None:
+        clauses.append(func.ST_Within(model.geom, bbox_envelope(bbox)))
+    if polygon_id is not None:
+        # Aliased so it is never correlated with the outer statement when that targets polygons too
+        container = aliased(PolygonDB)
+        container_geom = select(container.geom).filter(container.id == polygon_id).scalar_subquery()
+        clauses.append(func.ST_Within(model.geom, container_geom))
+        if model is PolygonDB:
+            clauses.append(model.id != polygon_id)
+    return clauses
+
+def metadata_filters(model, meta_filter: Optional[Dict[str, Any]] = None) -> list:
+    """
+    Build WHERE clauses requiring the metadata of `model` to contain `meta_filter`.
+    Containment (@>) is what the jsonb_path_ops GIN indexes on `meta` accelerate.
+    """
+    if not meta_filter:
+        return []
+    return [model.meta.contains(meta_filter)]
+
+def merged_metadata(model, patch: Dict[str, Any]):
+    """
+    Build the expression merging `patch` into the metadata of `model`.
+    Rows created without metadata hold the JSON value null (not SQL NULL), and `'null' || patch`
+    would build an array, so anything that isn't an object is replaced by the patch.
+    """
+    current = case((func.jsonb_typeof(model.meta) == "object", model.meta), else_=literal({}, JSONB))
+    return current.op("||")(literal(patch, JSONB))
@@ -0,0 +1,123 @@
+from typing import Any, Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+
+# Storage orders points can be clustered by, mapped to the index CLUSTER rewrites the table along.
+# The geohash index is a Z-order curve over lon/lat; the GiST index is the one GeoAlchemy2 creates.
+CLUSTER_INDEXES = {
+    "geohash": "ix_points_geohash",
+    "gist": "idx_points_geom",
+}
+
+# ~1 m cells, fine enough that neighbouring points in the key are neighbours on the map
+GEOHASH_PRECISION = 10
+
+# Advisory lock key that keeps concurrent maintenance runs (e.g. one per worker) from overlapping
+MAINTENANCE_LOCK_KEY = 7_301_001
+
+MAINTAINED_TABLES = ("points", "polygons", "point_polygon_membership")
+
+async def try_lock_maintenance(db: AsyncSession) -> bool:
+    """Take the maintenance advisory lock for the current transaction, without waiting"""
+    result = await db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+    return result.scalar()
+
+async def ensure_geohash_index(db: AsyncSession):
+    """
+    Create the geohash expression index used as clustering key. It is only created here, not
+    declared on the model, so deployments that never cluster don't maintain it on every write.
+    ST_GeoHash raises for coordinates outside +/-180/+/-90, which would then fail every write of
+    such a point, so those rows are indexed as NULL (sorted last) instead.
+    """
+    definition = await db.execute(
+        text("SELECT pg_get_indexdef(to_regclass(:index))"), {"index": CLUSTER_INDEXES["geohash"]}
+    )
+    existing = definition.scalar()
+    if existing is not None and "CASE" not in existing:
+        # Built by an earlier version on the unguarded ST_GeoHash expression
+        await db.execute(text(f"DROP INDEX {CLUSTER_INDEXES['geohash']}"))
+    await db.execute(text(
+        f"CREATE INDEX IF NOT EXISTS {CLUSTER_INDEXES['geohash']} ON points (("
+        "CASE WHEN ST_X(geom) BETWEEN -180 AND 180 AND ST_Y(geom) BETWEEN -90 AND 90 "
+        f"THEN ST_GeoHash(geom, {GEOHASH_PRECISION}) END))"
+    ))
+
+async def cluster_points(db: AsyncSession, key: str):
+    """
+    Rewrite the points table in the order of the `key` index; run analyze_tables afterwards.
+    CLUSTER holds an ACCESS EXCLUSIVE lock on points until the transaction commits.
+    """
+    if key == "geohash":
+        await ensure_geohash_index(db)
+    await db.execute(text(f"CLUSTER points USING {CLUSTER_INDEXES[key]}"))
+
+async def analyze_tables(db: AsyncSession):
+    for table in MAINTAINED_TABLES:
+        await db.execute(text(f"ANALYZE {table}"))
+
+async def get_table_health(db: AsyncSession) -> List[Dict[str, Any]]:
+    """Row counts, dead tuples, sizes and last vacuum/analyze times of the maintained tables"""
+    result = await db.execute(
+        text("""
+            SELECT relname AS table,
+                   n_live_tup AS live_rows,
+                   n_dead_tup AS dead_rows,
+                   pg_relation_size(relid) AS table_bytes,
+                   pg_indexes_size(relid) AS index_bytes,
+                   greatest(last_vacuum, last_autovacuum) AS last_vacuum,
+                   greatest(last_analyze, last_autoanalyze) AS last_analyze
+            FROM pg_stat_user_tables
+            WHERE relname = ANY(:tables)
+            ORDER BY relname
+        """),
+        {"tables": list(MAINTAINED_TABLES)},
+    )
+    return [dict(row) for row in result.mappings()]
+
+async def has_pgstattuple(db: AsyncSession) -> bool:
+    result = await db.execute(text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pgstattuple')"))
+    return result.scalar()
+
+async def get_index_health(db: AsyncSession) -> List[Dict[str, Any]]:
+    """
+    Size and scan count of each index on the maintained tables. With the pgstattuple extension
+    installed, free_percent (free space inside the index, i.e. bloat) is measured as well;
+    pgstattuple only supports btree, hash and GiST indexes, so it stays None for GIN.
+    """
+    free_percent = "NULL::float8"
+    if await has_pgstattuple(db):
+        free_percent = (
+            "CASE WHEN am.amname IN ('btree', 'hash', 'gist') "
+            "THEN (pgstattuple(s.indexrelid)).free_percent END"
+        )
+    result = await db.execute(
+        text(f"""
+            SELECT s.relname AS table,
+                   s.indexrelname AS index,
+                   am.amname AS method,
+                   pg_relation_size(s.indexrelid) AS index_bytes,
+                   s.idx_scan AS scans,
+                   i.indisclustered AS clustered_on,
+                   {free_percent} AS free_percent
+            FROM pg_stat_user_indexes s
+            JOIN pg_index i ON i.indexrelid = s.indexrelid
+            JOIN pg_class c ON c.oid = s.indexrelid
+            JOIN pg_am am ON am.oid = c.relam
+            WHERE s.relname = ANY(:tables)
+            ORDER BY s.relname, s.indexrelname
+        """),
+        {"tables": list(MAINTAINED_TABLES)},
+    )
+    return [dict(row) for row in result.mappings()]
+
+async def get_geohash_correlation(db: AsyncSession) -> Optional[float]:
+    """
+    How closely the physical row order of points follows the geohash key, from -1 to 1;
+    values near 1 mean spatially close points share pages. None until the geohash index
+    exists and has been analyzed.
+    """
+    result = await db.execute(
+        text("SELECT correlation FROM pg_stats WHERE tablename = :index"),
+        {"index": CLUSTER_INDEXES["geohash"]},
+    )
+    return result.scalar()
@@ -0,0 +1,139 @@
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+from app.models import PointDB, PolygonDB, PointPolygonMembershipDB as MembershipDB
+
+# Unless noted otherwise these functions don't commit: they run inside the transaction of the write they belong to
+
+# Advisory locks serialising point writes against polygon writes. A refresh only sees geometries committed
+# before it started, so a point and a polygon written concurrently would each miss the other. Writes lock the
+# cells of a lon/lat grid their geometries (before and after the write) touch: point writes shared, polygon
+# writes exclusive, so whichever refresh runs second sees the first, while writes in different areas and point
+# writes among themselves don't wait for each other. Cell locks are taken under the table-wide MEMBERSHIP_LOCK_KEY
+# held shared; writes touching too many cells, and full rebuilds, take that one exclusively instead.
+MEMBERSHIP_LOCK_KEY = 7_301_002
+MEMBERSHIP_LOCK_CELL_DEGREES = 1.0
+MEMBERSHIP_LOCK_MAX_CELLS = 256
+
+_GRID_COLUMNS = int(360 / MEMBERSHIP_LOCK_CELL_DEGREES)
+_GRID_ROWS = int(180 / MEMBERSHIP_LOCK_CELL_DEGREES)
+
+def _grid_index(value: float, origin: float, size: int) -> int:
+    # Clamped, points may lie outside +/-180/+/-90
+    return min(max(int((value - origin) // MEMBERSHIP_LOCK_CELL_DEGREES), 0), size - 1)
+
+def lock_cells(bounds: List[tuple]) -> Optional[List[int]]:
+    """
+    Sorted IDs of the grid cells touched by (min_lon, min_lat, max_lon, max_lat) bounds,
+    or None when there are more than MEMBERSHIP_LOCK_MAX_CELLS of them.
+    """
+    cells = set()
+    for min_lon, min_lat, max_lon, max_lat in bounds:
+        columns = range(_grid_index(min_lon, -180, _GRID_COLUMNS), _grid_index(max_lon, -180, _GRID_COLUMNS) + 1)
+        rows = range(_grid_index(min_lat, -90, _GRID_ROWS), _grid_index(max_lat, -90, _GRID_ROWS) + 1)
+        if len(cells) + len(columns) * len(rows) > MEMBERSHIP_LOCK_MAX_CELLS:
+            return None
+        cells.update(row * _GRID_COLUMNS + column for row in rows for column in columns)
+    return sorted(cells)
+
+async def _lock_area(db: AsyncSession, bounds: List[tuple], exclusive: bool):
+    cells = lock_cells(bounds)
+    if cells is None:
+        await lock_all_memberships(db)
+        return
+    await db.execute(select(func.pg_advisory_xact_lock_shared(MEMBERSHIP_LOCK_KEY)))
+    if cells:
+        # Always in ascending order, so two writes can't each hold a cell the other waits for
+        lock = "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+        await db.execute(
+            text(f"SELECT count({lock}(:key, cell)) FROM (SELECT unnest(CAST(:cells AS int[])) AS cell ORDER BY cell) AS cells"),
+            {"key": MEMBERSHIP_LOCK_KEY, "cells": cells},
+        )
+
+async def lock_for_point_write(db: AsyncSession, bounds: List[tuple]):
+    """Lock the area of the points being written until the transaction ends; call before the write's first statement"""
+    await _lock_area(db, bounds, exclusive=False)
+
+async def lock_for_polygon_write(db: AsyncSession, bounds: List[tuple]):
+    """Lock the area of the polygons being written until the transaction ends; call before the write's first statement"""
+    await _lock_area(db, bounds, exclusive=True)
+
+async def lock_all_memberships(db: AsyncSession):
+    """Lock out every point and polygon write until the transaction ends"""
+    await db.execute(select(func.pg_advisory_xact_lock(MEMBERSHIP_LOCK_KEY)))
+
+async def stored_bounds(db: AsyncSession, model, *filters) -> List[tuple]:
+    """(min_lon, min_lat, max_lon, max_lat) of the stored geometries of the `model` rows matching filters"""
+    result = await db.execute(
+        select(func.ST_XMin(model.geom), func.ST_YMin(model.geom), func.ST_XMax(model.geom), func.ST_YMax(model.geom))
+        .filter(*filters)
+    )
+    return [tuple(row) for row in result.all()]
+
+async def selection_bounds(db: AsyncSession, bbox: Optional[tuple] = None, polygon_id: Optional[int] = None) -> List[tuple]:
+    """Bounds enclosing everything a bulk selection (see filters.selection_filters) can match"""
+    if bbox is not None:
+        return [bbox]
+    return await stored_bounds(db, PolygonDB, PolygonDB.id == polygon_id)
+
+def _containment_pairs():
+    """(point_id, polygon_id) for every point contained by a polygon, computed with ST_Contains"""
+    return select(PointDB.id, PolygonDB.id).join(PolygonDB, func.ST_Contains(PolygonDB.geom, PointDB.geom))
+
+def _insert_pairs(pairs):
+    # ON CONFLICT keeps a concurrent rebuild and an incremental refresh from colliding
+    return insert(MembershipDB).from_select(["point_id", "polygon_id"], pairs).on_conflict_do_nothing()
+
+async def refresh_point_memberships(db: AsyncSession, point_ids: List[int], new_points: bool = False):
+    """Recompute the memberships of points that were created or moved"""
+    if not new_points:
+        await db.execute(delete(MembershipDB).filter(MembershipDB.point_id.in_(point_ids)))
+    await db.execute(_insert_pairs(_containment_pairs().filter(PointDB.id.in_(point_ids))))
+
+async def refresh_polygon_memberships(db: AsyncSession, polygon_ids: List[int], new_polygons: bool = False):
+    """Recompute the memberships of polygons that were created or reshaped"""
+    if not new_polygons:
+        await db.execute(delete(MembershipDB).filter(MembershipDB.polygon_id.in_(polygon_ids)))
+    await db.execute(_insert_pairs(_containment_pairs().filter(PolygonDB.id.in_(polygon_ids))))
+
+async def get_point_memberships(db: AsyncSession, point_ids: List[int], lock: bool = False) -> Dict[int, Set[int]]:
+    """
+    Get the IDs of the polygons containing each of the given points, keyed by point ID
+    (points that don't exist are left out).
+    With lock, the point rows are locked (FOR UPDATE) until the transaction ends, so
+    membership read before a write cannot be changed by a concurrent write to the same points.
+    """
+    query = select(PointDB.id, MembershipDB.polygon_id).outerjoin(
+        MembershipDB, MembershipDB.point_id == PointDB.id
+    ).filter(PointDB.id.in_(point_ids))
+    if lock:
+        query = query.with_for_update(of=PointDB)
+    result = await db.execute(query)
+
+    memberships: Dict[int, Set[int]] = {}
+    for point_id, polygon_id in result.all():
+        polygon_ids = memberships.setdefault(point_id, set())
+        if polygon_id is not None:
+            polygon_ids.add(polygon_id)
+    return memberships
+
+async def rebuild_memberships(db: AsyncSession) -> int:
+    """Recompute the whole membership table from the geometries, returning its row count"""
+    await lock_all_memberships(db)
+    await db.execute(delete(MembershipDB))
+    await db.execute(_insert_pairs(_containment_pairs()))
+    result = await db.execute(select(func.count()).select_from(MembershipDB))
+    return result.scalar_one()
+
+async def check_memberships(db: AsyncSession) -> Tuple[int, int]:
+    """
+    Compare the membership table with the geometries.
+    Returns (missing, stale): pairs that should be in the table but aren't, and pairs that shouldn't be but are.
+    """
+    expected = _containment_pairs()
+    stored = select(MembershipDB.point_id, MembershipDB.polygon_id)
+    missing = await db.execute(select(func.count()).select_from(expected.except_(stored).subquery()))
+    stale = await db.execute(select(func.count()).select_from(stored.except_(expected).subquery()))
+    return missing.scalar_one(), stale.scalar_one()
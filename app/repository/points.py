@@ -1,56 +1,126 @@
+from typing import Any, Dict, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import insert, update, delete
 from geoalchemy2.shape import from_shape
 from shapely.geometry import Point
 from app.models import PointDB
 from app.schemas import PointCreate
+from app.repository.filters import selection_filters, metadata_filters, merged_metadata
+from app.repository.rows import POINT_ROW_COLUMNS, fetch_all
+from app.repository import membership as membership_repo
 
-async def create_point(db: AsyncSession, point: PointCreate) -> PointDB:
-    """Create a new point in the database"""
+async def create_point(db: AsyncSession, point: PointCreate, commit: bool = True) -> PointDB:
+    """Create a new point in the database (left uncommitted when commit is False)"""
     geom = Point(point.longitude, point.latitude)
     db_point = PointDB(
         name=point.name,
         geom=from_shape(geom, srid=4326),
         meta=point.metadata
     )
+    await membership_repo.lock_for_point_write(db, [geom.bounds])
     db.add(db_point)
-    await db.commit()
+    await db.flush()
+    await membership_repo.refresh_point_memberships(db, [db_point.id], new_points=True)
+    if commit:
+        await db.commit()
     await db.refresh(db_point)
     return db_point
 
+async def create_points(db: AsyncSession, points: List[PointCreate], commit: bool = True) -> List[PointDB]:
+    """Create several points with one multi-row INSERT ... RETURNING, returned in input order"""
+    await membership_repo.lock_for_point_write(db, [(point.longitude, point.latitude) * 2 for point in points])
+    result = await db.execute(
+        insert(PointDB).returning(PointDB, sort_by_parameter_order=True),
+        [
+            {
+                "name": point.name,
+                "geom": from_shape(Point(point.longitude, point.latitude), srid=4326),
+                "meta": point.metadata,
+            } for point in points
+        ]
+    )
+    db_points = list(result.scalars().all())
+    await membership_repo.refresh_point_memberships(db, [db_point.id for db_point in db_points], new_points=True)
+    if commit:
+        await db.commit()
+    return db_points
+
 async def get_point(db: AsyncSession, point_id: int) -> PointDB:
     """Get a point by ID"""
     result = await db.execute(select(PointDB).filter(PointDB.id == point_id))
     return result.scalars().first()
 
-async def get_all_points(db: AsyncSession, skip: int = 0, limit: int = 100):
-    """Get all points with pagination"""
-    result = await db.execute(select(PointDB).offset(skip).limit(limit))
-    return result.scalars().all()
+async def get_all_points(db: AsyncSession, skip: int = 0, limit: int = 100, meta_filter: Optional[Dict[str, Any]] = None, as_rows: bool = False):
+    """Get all points with pagination, optionally only those whose metadata contains meta_filter"""
+    query = select(PointDB).filter(*metadata_filters(PointDB, meta_filter)).offset(skip).limit(limit)
+    return await fetch_all(db, query, POINT_ROW_COLUMNS, as_rows)
 
-async def update_point(db: AsyncSession, point_id: int, point: PointCreate) -> PointDB:
-    """Update a point by ID"""
-    result = await db.execute(select(PointDB).filter(PointDB.id == point_id))
-    db_point = result.scalars().first()
-    if db_point is None:
-        return None
-    
+async def lock_for_point_update(db: AsyncSession, point_id: int, point: PointCreate):
+    """Take the membership locks for moving a point from its stored position to the one in `point`"""
+    stored = await membership_repo.stored_bounds(db, PointDB, PointDB.id == point_id)
+    await membership_repo.lock_for_point_write(db, [(point.longitude, point.latitude) * 2, *stored])
+
+async def update_point(db: AsyncSession, point_id: int, point: PointCreate, commit: bool = True) -> PointDB:
+    """Update a point by ID with a single UPDATE ... RETURNING statement (left uncommitted when commit is False)"""
     geom = Point(point.longitude, point.latitude)
-    db_point.name = point.name
-    db_point.geom = from_shape(geom, srid=4326)
-    db_point.meta = point.metadata
-    
-    await db.commit()
-    await db.refresh(db_point)
+    await lock_for_point_update(db, point_id, point)
+    result = await db.execute(
+        update(PointDB)
+        .filter(PointDB.id == point_id)
+        .values(name=point.name, geom=from_shape(geom, srid=4326), meta=point.metadata)
+        .returning(PointDB)
+        .execution_options(synchronize_session=False)
+    )
+    db_point = result.scalars().first()
+    if db_point is not None:
+        await membership_repo.refresh_point_memberships(db, [point_id])
+    if commit:
+        await db.commit()
     return db_point
 
 async def delete_point(db: AsyncSession, point_id: int) -> bool:
-    """Delete a point by ID"""
-    result = await db.execute(select(PointDB).filter(PointDB.id == point_id))
-    db_point = result.scalars().first()
-    if not db_point:
-        return False
-        
-    await db.delete(db_point)
+    """Delete a point by ID with a single DELETE ... RETURNING statement"""
+    stored = await membership_repo.stored_bounds(db, PointDB, PointDB.id == point_id)
+    await membership_repo.lock_for_point_write(db, stored)
+    result = await db.execute(
+        delete(PointDB)
+        .filter(PointDB.id == point_id)
+        .returning(PointDB.id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted_id = result.scalars().first()
+    await db.commit()
+    return deleted_id is not None
+
+async def delete_points_matching(db: AsyncSession, bbox: Optional[tuple] = None, polygon_id: Optional[int] = None) -> List[int]:
+    """Delete every point within a bbox and/or a polygon in one statement, returning the deleted IDs"""
+    selected = await membership_repo.selection_bounds(db, bbox, polygon_id)
+    await membership_repo.lock_for_point_write(db, selected)
+    result = await db.execute(
+        delete(PointDB)
+        .filter(*selection_filters(PointDB, bbox, polygon_id))
+        .returning(PointDB.id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted_ids = list(result.scalars().all())
+    await db.commit()
+    return deleted_ids
+
+async def patch_points_metadata(
+    db: AsyncSession,
+    metadata: Dict[str, Any],
+    bbox: Optional[tuple] = None,
+    polygon_id: Optional[int] = None,
+) -> List[int]:
+    """Merge `metadata` into the metadata of every point within a bbox and/or a polygon, returning the updated IDs"""
+    result = await db.execute(
+        update(PointDB)
+        .filter(*selection_filters(PointDB, bbox, polygon_id))
+        .values(meta=merged_metadata(PointDB, metadata))
+        .returning(PointDB.id)
+        .execution_options(synchronize_session=False)
+    )
+    updated_ids = list(result.scalars().all())
     await db.commit()
-    return True 
\ No newline at end of file
+    return updated_ids
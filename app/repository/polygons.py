@@ -1,9 +1,14 @@
+from typing import Any, Dict, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import update, delete
 from geoalchemy2.shape import from_shape
 from shapely.geometry import Polygon
 from app.models import PolygonDB
 from app.schemas import PolygonCreate
+from app.repository.filters import selection_filters, metadata_filters, merged_metadata
+from app.repository.rows import POLYGON_ROW_COLUMNS, fetch_all
+from app.repository import membership as membership_repo
 
 async def create_polygon(db: AsyncSession, polygon: PolygonCreate) -> PolygonDB:
     """Create a new polygon in the database"""
@@ -13,7 +18,10 @@ async def create_polygon(db: AsyncSession, polygon: PolygonCreate) -> PolygonDB:
         geom=from_shape(geom, srid=4326),
         meta=polygon.metadata
     )
+    await membership_repo.lock_for_polygon_write(db, [geom.bounds])
     db.add(db_polygon)
+    await db.flush()
+    await membership_repo.refresh_polygon_memberships(db, [db_polygon.id], new_polygons=True)
     await db.commit()
     await db.refresh(db_polygon)
     return db_polygon
@@ -23,34 +31,71 @@ async def get_polygon(db: AsyncSession, polygon_id: int) -> PolygonDB:
     result = await db.execute(select(PolygonDB).filter(PolygonDB.id == polygon_id))
     return result.scalars().first()
 
-async def get_all_polygons(db: AsyncSession, skip: int = 0, limit: int = 100):
-    """Get all polygons with pagination"""
-    result = await db.execute(select(PolygonDB).offset(skip).limit(limit))
-    return result.scalars().all()
+async def get_all_polygons(db: AsyncSession, skip: int = 0, limit: int = 100, meta_filter: Optional[Dict[str, Any]] = None, as_rows: bool = False):
+    """Get all polygons with pagination, optionally only those whose metadata contains meta_filter"""
+    query = select(PolygonDB).filter(*metadata_filters(PolygonDB, meta_filter)).offset(skip).limit(limit)
+    return await fetch_all(db, query, POLYGON_ROW_COLUMNS, as_rows)
 
 async def update_polygon(db: AsyncSession, polygon_id: int, polygon: PolygonCreate) -> PolygonDB:
-    """Update a polygon by ID"""
-    result = await db.execute(select(PolygonDB).filter(PolygonDB.id == polygon_id))
-    db_polygon = result.scalars().first()
-    if not db_polygon:
-        return None
-        
+    """Update a polygon by ID with a single UPDATE ... RETURNING statement"""
     geom = Polygon(polygon.coordinates)
-    db_polygon.name = polygon.name
-    db_polygon.geom = from_shape(geom, srid=4326)
-    db_polygon.meta = polygon.metadata
-    
+    stored = await membership_repo.stored_bounds(db, PolygonDB, PolygonDB.id == polygon_id)
+    await membership_repo.lock_for_polygon_write(db, [geom.bounds, *stored])
+    result = await db.execute(
+        update(PolygonDB)
+        .filter(PolygonDB.id == polygon_id)
+        .values(name=polygon.name, geom=from_shape(geom, srid=4326), meta=polygon.metadata)
+        .returning(PolygonDB)
+        .execution_options(synchronize_session=False)
+    )
+    db_polygon = result.scalars().first()
+    if db_polygon is not None:
+        await membership_repo.refresh_polygon_memberships(db, [polygon_id])
     await db.commit()
-    await db.refresh(db_polygon)
     return db_polygon
 
 async def delete_polygon(db: AsyncSession, polygon_id: int) -> bool:
-    """Delete a polygon by ID"""
-    result = await db.execute(select(PolygonDB).filter(PolygonDB.id == polygon_id))
-    db_polygon = result.scalars().first()
-    if not db_polygon:
-        return False
-        
-    await db.delete(db_polygon)
+    """Delete a polygon by ID with a single DELETE ... RETURNING statement"""
+    stored = await membership_repo.stored_bounds(db, PolygonDB, PolygonDB.id == polygon_id)
+    await membership_repo.lock_for_polygon_write(db, stored)
+    result = await db.execute(
+        delete(PolygonDB)
+        .filter(PolygonDB.id == polygon_id)
+        .returning(PolygonDB.id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted_id = result.scalars().first()
+    await db.commit()
+    return deleted_id is not None
+
+async def delete_polygons_matching(db: AsyncSession, bbox: Optional[tuple] = None, polygon_id: Optional[int] = None) -> List[int]:
+    """Delete every polygon within a bbox and/or another polygon in one statement, returning the deleted IDs"""
+    selected = await membership_repo.selection_bounds(db, bbox, polygon_id)
+    await membership_repo.lock_for_polygon_write(db, selected)
+    result = await db.execute(
+        delete(PolygonDB)
+        .filter(*selection_filters(PolygonDB, bbox, polygon_id))
+        .returning(PolygonDB.id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted_ids = list(result.scalars().all())
+    await db.commit()
+    return deleted_ids
+
+async def patch_polygons_metadata(
+    db: AsyncSession,
+    metadata: Dict[str, Any],
+    bbox: Optional[tuple] = None,
+    polygon_id: Optional[int] = None,
+) -> List[int]:
+    """Merge `metadata` into the metadata of every polygon within a bbox and/or another polygon, returning the updated IDs"""
+    result = await db.execute(
+        update(PolygonDB)
+        .filter(*selection_filters(PolygonDB, bbox, polygon_id))
+        .values(meta=merged_metadata(PolygonDB, metadata))
+        .returning(PolygonDB.id)
+        .execution_options(synchronize_session=False)
+    )
+    updated_ids = list(result.scalars().all())
     await db.commit()
-    return True 
\ No newline at end of file
+    return updated_ids
@@ -0,0 +1,31 @@
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import PointDB, PolygonDB
+
+# Plain columns for the fast serialization path: queries select these with
+# `with_only_columns` instead of ORM entities, so no objects or shapes are built per row.
+
+# (id, name, latitude, longitude, meta)
+POINT_ROW_COLUMNS = (
+    PointDB.id,
+    PointDB.name,
+    func.ST_Y(PointDB.geom),
+    func.ST_X(PointDB.geom),
+    PointDB.meta,
+)
+
+# (id, name, exterior ring as little-endian WKB, meta)
+POLYGON_ROW_COLUMNS = (
+    PolygonDB.id,
+    PolygonDB.name,
+    func.ST_AsBinary(func.ST_ExteriorRing(PolygonDB.geom), "NDR"),
+    PolygonDB.meta,
+)
+
+async def fetch_all(db: AsyncSession, query, row_columns: tuple, as_rows: bool = False):
+    """Execute an entity query, returning ORM objects, or plain tuples of row_columns when as_rows is set"""
+    if as_rows:
+        result = await db.execute(query.with_only_columns(*row_columns))
+        return result.all()
+    result = await db.execute(query)
+    return result.scalars().all()
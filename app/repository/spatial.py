@@ -1,27 +1,36 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, cast
+from sqlalchemy import func, cast, and_, case, Float
+from sqlalchemy.orm import aliased
 from geoalchemy2.types import Geography
 from geoalchemy2.shape import to_shape
 from shapely.geometry import Point as ShapelyPoint # Renamed to avoid conflict
-import geopandas as gpd
-from app.models import PointDB, PolygonDB
+from app.models import PointDB, PolygonDB, PointPolygonMembershipDB as MembershipDB
+from app.repository.filters import bbox_envelope, metadata_filters
+from app.repository.rows import POINT_ROW_COLUMNS, POLYGON_ROW_COLUMNS, fetch_all
+from typing import Any, AsyncIterator, Dict, List, Optional, TYPE_CHECKING
 
-async def get_points_in_polygon(db: AsyncSession, polygon_id: int):
-    """Get all points that are within a specific polygon"""
-    # First get the polygon
-    polygon_result = await db.execute(select(PolygonDB).filter(PolygonDB.id == polygon_id))
-    polygon = polygon_result.scalars().first()
-    if not polygon:
+# Half the width of the Web Mercator (EPSG:3857) world in meters
+MERCATOR_HALF_WORLD = 20037508.342789244
+
+if TYPE_CHECKING:
+    import geopandas as gpd  # Imported lazily by get_points_in_bbox, it's slow to load
+
+async def get_points_in_polygon(db: AsyncSession, polygon_id: int, meta_filter: Optional[Dict[str, Any]] = None, as_rows: bool = False):
+    """Get all points that are within a specific polygon, optionally only those whose metadata contains meta_filter"""
+    # First check the polygon exists
+    polygon_result = await db.execute(select(PolygonDB.id).filter(PolygonDB.id == polygon_id))
+    if polygon_result.scalar() is None:
         return None
     
-    # Then find all points within that polygon using ST_Within
-    query = select(PointDB).filter(func.ST_Within(PointDB.geom, polygon.geom))
-    result = await db.execute(query)
-    return result.scalars().all()
+    # Then read its points from the materialized membership relation instead of running ST_Within
+    query = select(PointDB).join(MembershipDB, MembershipDB.point_id == PointDB.id).filter(
+        MembershipDB.polygon_id == polygon_id, *metadata_filters(PointDB, meta_filter)
+    )
+    return await fetch_all(db, query, POINT_ROW_COLUMNS, as_rows)
 
-async def get_points_near(db: AsyncSession, point_id: int, radius_meters: float):
-    """Get all points within a certain radius of a point"""
+async def get_points_near(db: AsyncSession, point_id: int, radius_meters: float, meta_filter: Optional[Dict[str, Any]] = None, as_rows: bool = False):
+    """Get all points within a certain radius of a point, optionally only those whose metadata contains meta_filter"""
     # First get the reference point
     point_result = await db.execute(select(PointDB).filter(PointDB.id == point_id))
     reference_point = point_result.scalars().first()
@@ -38,25 +47,25 @@ async def get_points_near(db: AsyncSession, point_id: int, radius_meters: float)
             radius_meters
         )
     ).filter(PointDB.id != point_id)  # Exclude the reference point
+    query = query.filter(*metadata_filters(PointDB, meta_filter))
     
-    result = await db.execute(query)
-    return result.scalars().all()
+    return await fetch_all(db, query, POINT_ROW_COLUMNS, as_rows)
 
-async def get_polygons_containing_point(db: AsyncSession, point_id: int):
-    """Get all polygons that contain a specific point"""
-    # First get the point
-    point_result = await db.execute(select(PointDB).filter(PointDB.id == point_id))
-    point = point_result.scalars().first()
-    if not point:
+async def get_polygons_containing_point(db: AsyncSession, point_id: int, meta_filter: Optional[Dict[str, Any]] = None, as_rows: bool = False):
+    """Get all polygons that contain a specific point, optionally only those whose metadata contains meta_filter"""
+    # First check the point exists
+    point_result = await db.execute(select(PointDB.id).filter(PointDB.id == point_id))
+    if point_result.scalar() is None:
         return None
     
-    # Then find all polygons containing that point using ST_Contains
-    query = select(PolygonDB).filter(func.ST_Contains(PolygonDB.geom, point.geom))
-    result = await db.execute(query)
-    return result.scalars().all()
+    # Then read its polygons from the materialized membership relation instead of running ST_Contains
+    query = select(PolygonDB).join(MembershipDB, MembershipDB.polygon_id == PolygonDB.id).filter(
+        MembershipDB.point_id == point_id, *metadata_filters(PolygonDB, meta_filter)
+    )
+    return await fetch_all(db, query, POLYGON_ROW_COLUMNS, as_rows)
 
-async def get_overlapping_polygons(db: AsyncSession, polygon_id: int):
-    """Get all polygons that overlap with a specific polygon"""
+async def get_overlapping_polygons(db: AsyncSession, polygon_id: int, meta_filter: Optional[Dict[str, Any]] = None, as_rows: bool = False):
+    """Get all polygons that overlap with a specific polygon, optionally only those whose metadata contains meta_filter"""
     # First get the reference polygon
     polygon_result = await db.execute(select(PolygonDB).filter(PolygonDB.id == polygon_id))
     reference_polygon = polygon_result.scalars().first()
@@ -67,12 +76,14 @@ async def get_overlapping_polygons(db: AsyncSession, polygon_id: int):
     query = select(PolygonDB).filter(
         func.ST_Overlaps(PolygonDB.geom, reference_polygon.geom)
     ).filter(PolygonDB.id != polygon_id)  # Exclude the reference polygon
+    query = query.filter(*metadata_filters(PolygonDB, meta_filter))
     
-    result = await db.execute(query)
-    return result.scalars().all()
+    return await fetch_all(db, query, POLYGON_ROW_COLUMNS, as_rows)
 
-async def get_points_in_bbox(db: AsyncSession, bbox: tuple) -> gpd.GeoDataFrame:
+async def get_points_in_bbox(db: AsyncSession, bbox: tuple) -> "gpd.GeoDataFrame":
     """Get points within a bounding box and return as a GeoDataFrame."""
+    import geopandas as gpd
+
     min_lon, min_lat, max_lon, max_lat = bbox
     stmt = select(PointDB).filter(
         func.ST_Within(PointDB.geom, func.ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326))
@@ -89,4 +100,114 @@ async def get_points_in_bbox(db: AsyncSession, bbox: tuple) -> gpd.GeoDataFrame:
         geometry=geometries,
         crs="EPSG:4326"
     )
-    return gdf 
\ No newline at end of file
+    return gdf
+
+async def get_point_clusters(db: AsyncSession, bbox: tuple, cell_size: float, meta_filter: Optional[Dict[str, Any]] = None):
+    """
+    Cluster the points within a bbox into the cells of a Web Mercator (EPSG:3857) grid of
+    cell_size meters. Returns (count, longitude, latitude, min_id) per non-empty cell, where the
+    position is the mean of the clustered points. Only points whose metadata contains meta_filter are clustered.
+    """
+    # The grid starts at the world's western/southern edge, offset by half a cell so snapping
+    # lands on cell centres: each point falls in the cell [k * cell_size, (k + 1) * cell_size),
+    # and cells never straddle tile edges
+    origin = -MERCATOR_HALF_WORLD + cell_size / 2
+    cell = func.ST_SnapToGrid(func.ST_Transform(PointDB.geom, 3857), origin, origin, cell_size, cell_size)
+    query = select(
+        func.count(PointDB.id),
+        func.avg(func.ST_X(PointDB.geom)),
+        func.avg(func.ST_Y(PointDB.geom)),
+        func.min(PointDB.id),
+    ).filter(
+        func.ST_Intersects(PointDB.geom, bbox_envelope(bbox)),
+        *metadata_filters(PointDB, meta_filter)
+    ).group_by(cell)
+    result = await db.execute(query)
+    return [tuple(row) for row in result.all()]
+
+async def get_polygon_stats(
+    db: AsyncSession,
+    polygon_ids: Optional[List[int]] = None,
+    bbox: Optional[tuple] = None,
+    fields: Optional[List[str]] = None,
+    meta_filter: Optional[Dict[str, Any]] = None,
+) -> List[tuple]:
+    """
+    Aggregate the points within each polygon in one grouped query.
+    Returns (id, name, point_count, then sum, avg, min, max for each of `fields`) per polygon,
+    ordered by id. Polygons can be limited to polygon_ids and/or those intersecting a bbox, points
+    to those whose metadata contains meta_filter. Metadata values that aren't JSON numbers are ignored.
+    """
+    aggregates = []
+    for field in fields or []:
+        value = case(
+            (func.jsonb_typeof(PointDB.meta[field]) == "number", cast(PointDB.meta[field].astext, Float))
+        )
+        aggregates.extend([func.sum(value), func.avg(value), func.min(value), func.max(value)])
+
+    # Containment comes from the materialized membership relation (kept in sync with ST_Contains);
+    # outer joins keep polygons without points, with a count of 0
+    query = select(PolygonDB.id, PolygonDB.name, func.count(PointDB.id), *aggregates).outerjoin(
+        MembershipDB, MembershipDB.polygon_id == PolygonDB.id
+    ).outerjoin(
+        PointDB, and_(PointDB.id == MembershipDB.point_id, *metadata_filters(PointDB, meta_filter))
+    )
+    if polygon_ids:
+        query = query.filter(PolygonDB.id.in_(polygon_ids))
+    if bbox is not None:
+        query = query.filter(func.ST_Intersects(PolygonDB.geom, bbox_envelope(bbox)))
+    query = query.group_by(PolygonDB.id, PolygonDB.name).order_by(PolygonDB.id)
+    result = await db.execute(query)
+    return [tuple(row) for row in result.all()]
+
+async def get_polygon_extent(db: AsyncSession) -> Optional[tuple]:
+    """Get the (min_lon, min_lat, max_lon, max_lat) extent of all polygons, or None if there are none"""
+    extent = func.ST_Extent(PolygonDB.geom)
+    result = await db.execute(select(
+        func.ST_XMin(extent), func.ST_YMin(extent), func.ST_XMax(extent), func.ST_YMax(extent)
+    ))
+    bounds = tuple(result.one())
+    return None if bounds[0] is None else bounds
+
+async def stream_overlapping_pairs(
+    db: AsyncSession,
+    batch_size: int,
+    with_area: bool = False,
+    tile: Optional[tuple] = None,
+    meta_filter: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[List[tuple]]:
+    """
+    Stream every pair of overlapping polygons as (a_id, b_id[, intersection area in m²]) with a_id < b_id,
+    found with one index-driven self-join (bbox && then ST_Overlaps), in batches through a server-side cursor.
+
+    `tile` is (min_lon, min_lat, max_lon, max_lat, closed_max_lon, closed_max_lat) and restricts the pairs to
+    those whose bbox intersection has its lower-left corner in the tile. The tile is half-open unless a
+    closed_* flag is set, so tiles covering an extent partition the pairs without duplicates.
+    With meta_filter, only pairs of polygons whose metadata both contain it are returned.
+    """
+    a = aliased(PolygonDB)
+    b = aliased(PolygonDB)
+    columns = [a.id, b.id]
+    if with_area:
+        columns.append(func.ST_Area(cast(func.ST_Intersection(a.geom, b.geom), Geography)))
+    query = select(*columns).join(
+        b, and_(a.id < b.id, a.geom.op("&&")(b.geom), func.ST_Overlaps(a.geom, b.geom))
+    ).filter(*metadata_filters(a, meta_filter), *metadata_filters(b, meta_filter))
+
+    if tile is not None:
+        min_lon, min_lat, max_lon, max_lat, closed_max_lon, closed_max_lat = tile
+        envelope = bbox_envelope((min_lon, min_lat, max_lon, max_lat))
+        corner_lon = func.greatest(func.ST_XMin(a.geom), func.ST_XMin(b.geom))
+        corner_lat = func.greatest(func.ST_YMin(a.geom), func.ST_YMin(b.geom))
+        query = query.filter(
+            a.geom.op("&&")(envelope),
+            b.geom.op("&&")(envelope),
+            corner_lon >= min_lon,
+            corner_lon <= max_lon if closed_max_lon else corner_lon < max_lon,
+            corner_lat >= min_lat,
+            corner_lat <= max_lat if closed_max_lat else corner_lat < max_lat,
+        )
+
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for rows in result.partitions(batch_size):
+        yield [tuple(row) for row in rows]
@@ -0,0 +1,66 @@
+import json
+from fastapi import Depends, HTTPException, Query
+from typing import Any, Dict, List, Optional, Tuple
+
+def optional_bbox(
+    min_lat: Optional[float] = Query(None, description="Minimum latitude"),
+    max_lat: Optional[float] = Query(None, description="Maximum latitude"),
+    min_lon: Optional[float] = Query(None, description="Minimum longitude"),
+    max_lon: Optional[float] = Query(None, description="Maximum longitude"),
+) -> Optional[tuple]:
+    """
+    Dependency for an optional bounding box filter.
+    Returns (min_lon, min_lat, max_lon, max_lat), or None when no bound is given.
+    """
+    bounds = (min_lon, min_lat, max_lon, max_lat)
+    if all(bound is None for bound in bounds):
+        return None
+    if any(bound is None for bound in bounds):
+        raise HTTPException(status_code=400, detail="min_lat, max_lat, min_lon and max_lon must be given together")
+    return bounds
+
+def bulk_selection(
+    bbox: Optional[tuple] = Depends(optional_bbox),
+    polygon_id: Optional[int] = Query(None, description="Only match geometries within this polygon"),
+) -> Tuple[Optional[tuple], Optional[int]]:
+    """
+    Dependency for the selection of a bulk mutation: a bbox and/or a containing polygon.
+    At least one is required so a bulk call can never touch the whole table by accident.
+    """
+    if bbox is None and polygon_id is None:
+        raise HTTPException(status_code=400, detail="A bounding box or polygon_id is required")
+    return bbox, polygon_id
+
+def metadata_filter(
+    meta: Optional[str] = Query(None, description='JSON object the metadata must contain, e.g. {"amenity": "cafe"}'),
+    meta_eq: List[str] = Query([], description="key:value pairs the metadata must equal; the value is a JSON scalar or a plain string, e.g. wifi:true"),
+) -> Optional[Dict[str, Any]]:
+    """
+    Dependency for filtering on metadata.
+    Both forms are combined into a single containment object, so they are served by the GIN index on `meta`.
+    `meta_eq` values must be scalars, for which containment is equality; objects and arrays go in `meta`,
+    where they mean containment. A key given twice with different values is rejected.
+    """
+    conditions: Dict[str, Any] = {}
+    if meta is not None:
+        try:
+            contained = json.loads(meta)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="meta must be a JSON object")
+        if not isinstance(contained, dict):
+            raise HTTPException(status_code=400, detail="meta must be a JSON object")
+        conditions.update(contained)
+    for pair in meta_eq:
+        key, separator, raw_value = pair.partition(":")
+        if not separator or not key:
+            raise HTTPException(status_code=400, detail=f"Invalid meta_eq '{pair}', expected key:value")
+        try:
+            value = json.loads(raw_value)
+        except json.JSONDecodeError:
+            value = raw_value  # Plain strings don't need quoting
+        if isinstance(value, (dict, list)):
+            raise HTTPException(status_code=400, detail=f"Invalid meta_eq '{pair}', the value must be a scalar; use meta for objects and arrays")
+        if key in conditions and conditions[key] != value:
+            raise HTTPException(status_code=400, detail=f"Conflicting metadata filters for '{key}'")
+        conditions[key] = value
+    return conditions or None
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, Path, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app.schemas import ExportTable
+from app.services import export as export_service
+from app.routes.dependencies import optional_bbox
+from app.config import settings
+
+router = APIRouter()
+
+@router.get("/{table}", response_class=StreamingResponse, summary="Export a table as GeoParquet")
+async def export_table(
+    table: ExportTable = Path(..., description="The table to export"),
+    bbox: Optional[tuple] = Depends(optional_bbox),
+    batch_size: int = Query(settings.EXPORT_BATCH_SIZE, ge=1, le=100000, description="Rows per row group"),
+):
+    """
+    Stream a full table, optionally limited to geometries intersecting a bounding box, as a GeoParquet file.
+
+    Rows are read through a server-side cursor and written one row group per batch,
+    so memory use is bounded by the batch size rather than the table size.
+    """
+    return StreamingResponse(
+        export_service.stream_geoparquet(table.value, bbox, batch_size),
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="{table.value}.parquet"'},
+    )
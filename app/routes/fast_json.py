@@ -0,0 +1,49 @@
+import struct
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+# WKB LineString header: byte order (1 byte), geometry type (4 bytes), point count (4 bytes)
+_WKB_LINESTRING_HEADER_SIZE = 9
+
+def ring_coordinates(ring_wkb: bytes) -> list:
+    """Decode a little-endian 2D WKB LineString into [(x, y), ...], like shapely's `coords`"""
+    return list(struct.iter_unpack("<dd", memoryview(ring_wkb)[_WKB_LINESTRING_HEADER_SIZE:]))
+
+def _json_response(content: list) -> JSONResponse:
+    """
+    Encode with orjson, falling back to the standard encoder for the rare metadata orjson rejects:
+    integers outside the 64-bit range, which JSONB can hold.
+    """
+    try:
+        return ORJSONResponse(content)
+    except TypeError:  # orjson.JSONEncodeError
+        return JSONResponse(content)
+
+def point_rows_response(rows) -> JSONResponse:
+    """
+    Encode (id, name, latitude, longitude, meta) rows with orjson.
+    Produces the same JSON as returning List[PointResponse], without building or validating a model per row.
+    """
+    return _json_response([
+        {
+            "id": point_id,
+            "name": name,
+            "latitude": latitude,
+            "longitude": longitude,
+            "metadata": meta,
+        } for point_id, name, latitude, longitude, meta in rows
+    ])
+
+def polygon_rows_response(rows) -> JSONResponse:
+    """
+    Encode (id, name, exterior ring WKB, meta) rows with orjson.
+    Produces the same JSON as returning List[PolygonResponse] from the list and spatial routes (image_url is null).
+    """
+    return _json_response([
+        {
+            "id": polygon_id,
+            "name": name,
+            "coordinates": ring_coordinates(ring_wkb),
+            "metadata": meta,
+            "image_url": None,
+        } for polygon_id, name, ring_wkb, meta in rows
+    ])
@@ -0,0 +1,67 @@
+import asyncio
+from fastapi import APIRouter, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Set
+from app.services.geofence import geofence_broker
+
+router = APIRouter()
+
+# Comment lines sent on idle SSE streams so proxies don't close them
+SSE_KEEPALIVE_SECONDS = 15
+
+def _id_filter(ids: List[int]) -> Optional[Set[int]]:
+    return set(ids) if ids else None
+
+@router.get("/events", response_class=StreamingResponse, summary="Stream geofence events (Server-Sent Events)")
+async def stream_geofence_events(
+    request: Request,
+    point_id: List[int] = Query([], description="Only send events for these points"),
+    polygon_id: List[int] = Query([], description="Only send events for these polygons"),
+):
+    """
+    Stream `enter`/`exit` events as Server-Sent Events whenever a created or updated point
+    starts or stops being contained by a polygon. Events are evaluated once per write,
+    in the write's transaction, so clients don't have to poll `/spatial/polygons-containing-point`.
+    """
+    subscription = geofence_broker.subscribe(_id_filter(point_id), _id_filter(polygon_id))
+
+    async def event_stream():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event.event}\ndata: {event.model_dump_json()}\n\n"
+        finally:
+            geofence_broker.unsubscribe(subscription)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.websocket("/ws")
+async def geofence_events_websocket(
+    websocket: WebSocket,
+    point_id: List[int] = Query([]),
+    polygon_id: List[int] = Query([]),
+):
+    """Push geofence events as JSON messages over a WebSocket, with the same filters as `/geofence/events`"""
+    await websocket.accept()
+    subscription = geofence_broker.subscribe(_id_filter(point_id), _id_filter(polygon_id))
+    receive = asyncio.create_task(websocket.receive_text())
+    next_event = asyncio.create_task(subscription.queue.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait({receive, next_event}, return_when=asyncio.FIRST_COMPLETED)
+            if receive in done:
+                receive.result()  # Raises WebSocketDisconnect once the client has gone
+                receive = asyncio.create_task(websocket.receive_text())  # Other client messages are ignored
+            if next_event in done:
+                await websocket.send_text(next_event.result().model_dump_json())
+                next_event = asyncio.create_task(subscription.queue.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receive.cancel()
+        next_event.cancel()
+        geofence_broker.unsubscribe(subscription)
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from geoalchemy2.shape import to_shape
-from typing import List, Optional
-from app.schemas import PointCreate, PointResponse
+from typing import Any, Dict, List, Optional
+from app.schemas import PointCreate, PointResponse, MetadataPatch, BulkMutationResponse
 from app.services import points as points_service
 from app.db import get_db
+from app.routes.dependencies import bulk_selection, metadata_filter
+from app.routes.fast_json import point_rows_response
+from app.config import settings
 
 router = APIRouter()
 
@@ -30,6 +33,34 @@ async def create_point(
         metadata=db_point.meta
     )
 
+@router.delete("/bulk", response_model=BulkMutationResponse, summary="Delete all points in an area")
+async def delete_points_matching(
+    selection: tuple = Depends(bulk_selection),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Delete every point lying within a bounding box and/or within a polygon
+    (`polygon_id`), in a single statement. At least one of the two is required.
+    """
+    bbox, polygon_id = selection
+    deleted_ids = await points_service.delete_points_matching(db, bbox, polygon_id)
+    return BulkMutationResponse(count=len(deleted_ids), ids=deleted_ids)
+
+@router.patch("/bulk/metadata", response_model=BulkMutationResponse, summary="Patch the metadata of all points in an area")
+async def patch_points_metadata(
+    patch: MetadataPatch,
+    selection: tuple = Depends(bulk_selection),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Merge the given keys into the metadata of every point lying within a bounding box
+    and/or within a polygon (`polygon_id`), in a single statement.
+    Existing keys not present in the patch are kept.
+    """
+    bbox, polygon_id = selection
+    updated_ids = await points_service.patch_points_metadata(db, patch.metadata, bbox, polygon_id)
+    return BulkMutationResponse(count=len(updated_ids), ids=updated_ids)
+
 @router.get("/{point_id}", response_model=PointResponse, summary="Get a point by ID")
 async def get_point(
     point_id: int, 
@@ -55,12 +86,18 @@ async def get_point(
 async def get_all_points(
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
+    meta_filter: Optional[Dict[str, Any]] = Depends(metadata_filter),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Retrieve all points with pagination
+    Retrieve all points with pagination, optionally filtered on metadata
+    (`meta` containment and/or `meta_eq` key:value pairs)
     """
-    points = await points_service.get_all_points(db, skip, limit)
+    if settings.FAST_JSON_RESPONSES:
+        rows = await points_service.get_all_points(db, skip, limit, meta_filter, as_rows=True)
+        return point_rows_response(rows)
+
+    points = await points_service.get_all_points(db, skip, limit, meta_filter)
     return [
         PointResponse(
             id=point.id,
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from geoalchemy2.shape import to_shape
-from typing import List, Optional
-from app.schemas import PolygonCreate, PolygonResponse
+from typing import Any, Dict, List, Optional
+from app.schemas import PolygonCreate, PolygonResponse, MetadataPatch, BulkMutationResponse
 from app.services import polygons as polygons_service
 from app.db import get_db
+from app.routes.dependencies import bulk_selection, metadata_filter
+from app.routes.fast_json import polygon_rows_response
+from app.config import settings
 
 router = APIRouter()
 
@@ -33,6 +36,34 @@ async def create_polygon(
         image_url=image_url # Include the image URL
     )
 
+@router.delete("/bulk", response_model=BulkMutationResponse, summary="Delete all polygons in an area")
+async def delete_polygons_matching(
+    selection: tuple = Depends(bulk_selection),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Delete every polygon lying within a bounding box and/or within another polygon
+    (`polygon_id`), in a single statement. At least one of the two is required.
+    """
+    bbox, polygon_id = selection
+    deleted_ids = await polygons_service.delete_polygons_matching(db, bbox, polygon_id)
+    return BulkMutationResponse(count=len(deleted_ids), ids=deleted_ids)
+
+@router.patch("/bulk/metadata", response_model=BulkMutationResponse, summary="Patch the metadata of all polygons in an area")
+async def patch_polygons_metadata(
+    patch: MetadataPatch,
+    selection: tuple = Depends(bulk_selection),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Merge the given keys into the metadata of every polygon lying within a bounding box
+    and/or within another polygon (`polygon_id`), in a single statement.
+    Existing keys not present in the patch are kept.
+    """
+    bbox, polygon_id = selection
+    updated_ids = await polygons_service.patch_polygons_metadata(db, patch.metadata, bbox, polygon_id)
+    return BulkMutationResponse(count=len(updated_ids), ids=updated_ids)
+
 @router.get("/{polygon_id}", response_model=PolygonResponse, summary="Get a polygon by ID")
 async def get_polygon(
     polygon_id: int,
@@ -58,14 +89,20 @@ async def get_polygon(
 async def get_all_polygons(
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
+    meta_filter: Optional[Dict[str, Any]] = Depends(metadata_filter),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Retrieve all polygons with pagination.
+    Retrieve all polygons with pagination, optionally filtered on metadata
+    (`meta` containment and/or `meta_eq` key:value pairs).
     NOTE: Image URLs are not generated for this list endpoint for performance.
     Request individual polygons to get their image URLs.
     """
-    polygons = await polygons_service.get_all_polygons(db, skip, limit)
+    if settings.FAST_JSON_RESPONSES:
+        rows = await polygons_service.get_all_polygons(db, skip, limit, meta_filter, as_rows=True)
+        return polygon_rows_response(rows)
+
+    polygons = await polygons_service.get_all_polygons(db, skip, limit, meta_filter)
     return [
         PolygonResponse(
             id=polygon.id,
@@ -1,13 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from geoalchemy2.shape import to_shape
-from typing import List, Optional
-from app.schemas import PointResponse, PolygonResponse
+from typing import Any, Dict, List, Optional
+from app.schemas import PointResponse, PolygonResponse, ClusterResponse, ClustersResponse, FieldStats, PolygonStatsResponse
 from app.services import spatial as spatial_service
+from app.services import overlaps as overlaps_service
 from app.db import get_db
+from app.routes.dependencies import metadata_filter, optional_bbox
+from app.routes.fast_json import point_rows_response, polygon_rows_response
+from app.config import settings
 
 router = APIRouter()
 
+# Each field adds four aggregates to the grouped query
+MAX_STATS_FIELDS = 20
+
 @router.get(
     "/points-in-polygon/{polygon_id}", 
     response_model=List[PointResponse],
@@ -15,17 +23,22 @@ router = APIRouter()
 )
 async def get_points_in_polygon(
     polygon_id: int = Path(..., description="The ID of the polygon"), 
+    meta_filter: Optional[Dict[str, Any]] = Depends(metadata_filter),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Retrieve all points that are located within the specified polygon.
     
     This is a spatial query that uses the PostGIS ST_Within function to find
-    points whose geometries are completely inside the polygon.
+    points whose geometries are completely inside the polygon. Optional metadata filters
+    (`meta`, `meta_eq`) are applied in the same query.
     """
-    points = await spatial_service.get_points_in_polygon(db, polygon_id)
+    fast = settings.FAST_JSON_RESPONSES
+    points = await spatial_service.get_points_in_polygon(db, polygon_id, meta_filter, as_rows=fast)
     if points is None:
         raise HTTPException(status_code=404, detail="Polygon not found")
+    if fast:
+        return point_rows_response(points)
         
     return [
         PointResponse(
@@ -33,7 +46,7 @@ async def get_points_in_polygon(
             name=point.name,
             latitude=to_shape(point.geom).y,
             longitude=to_shape(point.geom).x,
-            metadata=point.metadata
+            metadata=point.meta
         ) for point in points
     ]
 
@@ -45,17 +58,22 @@ async def get_points_in_polygon(
 async def get_points_near(
     point_id: int = Path(..., description="The ID of the reference point"),
     radius: float = Path(..., description="The radius in meters"),
+    meta_filter: Optional[Dict[str, Any]] = Depends(metadata_filter),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Retrieve all points that are within a specified radius of the reference point.
     
     This spatial query uses the PostGIS ST_DWithin function with a geography cast
-    to find points within the given distance in meters.
+    to find points within the given distance in meters. Optional metadata filters
+    (`meta`, `meta_eq`) are applied in the same query.
     """
-    points = await spatial_service.get_points_near(db, point_id, radius)
+    fast = settings.FAST_JSON_RESPONSES
+    points = await spatial_service.get_points_near(db, point_id, radius, meta_filter, as_rows=fast)
     if points is None:
         raise HTTPException(status_code=404, detail="Reference point not found")
+    if fast:
+        return point_rows_response(points)
         
     return [
         PointResponse(
@@ -74,24 +92,29 @@ async def get_points_near(
 )
 async def get_polygons_containing_point(
     point_id: int = Path(..., description="The ID of the point"), 
+    meta_filter: Optional[Dict[str, Any]] = Depends(metadata_filter),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Retrieve all polygons that contain the specified point.
     
     This spatial query uses the PostGIS ST_Contains function to find
-    polygons whose geometries completely contain the point.
+    polygons whose geometries completely contain the point. Optional metadata filters
+    (`meta`, `meta_eq`) are applied in the same query.
     """
-    polygons = await spatial_service.get_polygons_containing_point(db, point_id)
+    fast = settings.FAST_JSON_RESPONSES
+    polygons = await spatial_service.get_polygons_containing_point(db, point_id, meta_filter, as_rows=fast)
     if polygons is None:
         raise HTTPException(status_code=404, detail="Point not found")
+    if fast:
+        return polygon_rows_response(polygons)
         
     return [
         PolygonResponse(
             id=polygon.id,
             name=polygon.name,
             coordinates=list(to_shape(polygon.geom).exterior.coords),
-            metadata=polygon.metadata
+            metadata=polygon.meta
         ) for polygon in polygons
     ]
 
@@ -102,6 +125,7 @@ async def get_polygons_containing_point(
 )
 async def get_overlapping_polygons(
     polygon_id: int = Path(..., description="The ID of the reference polygon"), 
+    meta_filter: Optional[Dict[str, Any]] = Depends(metadata_filter),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -109,17 +133,122 @@ async def get_overlapping_polygons(
     
     This spatial query uses the PostGIS ST_Overlaps function to find
     polygons whose geometries share some portion of space with the reference
-    polygon without being completely inside or containing it.
+    polygon without being completely inside or containing it. Optional metadata filters
+    (`meta`, `meta_eq`) are applied in the same query.
     """
-    polygons = await spatial_service.get_overlapping_polygons(db, polygon_id)
+    fast = settings.FAST_JSON_RESPONSES
+    polygons = await spatial_service.get_overlapping_polygons(db, polygon_id, meta_filter, as_rows=fast)
     if polygons is None:
         raise HTTPException(status_code=404, detail="Reference polygon not found")
+    if fast:
+        return polygon_rows_response(polygons)
         
     return [
         PolygonResponse(
             id=polygon.id,
             name=polygon.name,
             coordinates=list(to_shape(polygon.geom).exterior.coords),
-            metadata=polygon.metadata
+            metadata=polygon.meta
         ) for polygon in polygons
-    ] 
\ No newline at end of file
+    ]
+
+@router.get(
+    "/clusters",
+    response_model=ClustersResponse,
+    summary="Cluster points for a map zoom level"
+)
+async def get_point_clusters(
+    min_lat: float = Query(..., description="Minimum latitude"),
+    max_lat: float = Query(..., description="Maximum latitude"),
+    min_lon: float = Query(..., description="Minimum longitude"),
+    max_lon: float = Query(..., description="Maximum longitude"),
+    zoom: int = Query(..., ge=0, le=22, description="Map zoom level"),
+    meta_filter: Optional[Dict[str, Any]] = Depends(metadata_filter),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Retrieve point clusters for drawing a map at the given zoom level.
+
+    The bounding box is widened to whole Web Mercator (XYZ) tiles and the points in it are grouped
+    in the database by snapping them to a grid (ST_SnapToGrid) of a fixed number of cells per tile.
+    Each cluster is returned once with its point count and mean position, instead of every point.
+    Results are cached per tile-aligned bounding box until points are written.
+    """
+    bbox = (min_lon, min_lat, max_lon, max_lat)
+    if spatial_service.cluster_cell_count(bbox, zoom) > settings.CLUSTER_MAX_CELLS:
+        raise HTTPException(status_code=400, detail="Bounding box too large for this zoom level, zoom out or narrow it")
+    tile_bbox, clusters = await spatial_service.get_point_clusters(db, bbox, zoom, meta_filter)
+    return ClustersResponse(
+        zoom=zoom,
+        bbox=list(tile_bbox),
+        clusters=[
+            ClusterResponse(
+                longitude=longitude,
+                latitude=latitude,
+                count=count,
+                point_id=min_id if count == 1 else None
+            ) for count, longitude, latitude, min_id in clusters
+        ]
+    )
+
+@router.get(
+    "/polygon-stats",
+    response_model=List[PolygonStatsResponse],
+    summary="Aggregate the points within each polygon"
+)
+async def get_polygon_stats(
+    polygon_id: List[int] = Query([], description="Only these polygons"),
+    bbox: Optional[tuple] = Depends(optional_bbox),
+    field: List[str] = Query([], description="Numeric metadata fields to aggregate (sum, avg, min, max)"),
+    meta_filter: Optional[Dict[str, Any]] = Depends(metadata_filter),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Retrieve, for each polygon, the number of points it contains and the sum, average, minimum
+    and maximum of the requested numeric metadata `field`s of those points, e.g. for choropleths.
+
+    Polygons can be limited with `polygon_id` and/or a bounding box they intersect, and points with
+    the metadata filters (`meta`, `meta_eq`). All polygons are aggregated by one grouped query,
+    and results are cached until points or polygons are written.
+    """
+    if len(field) > MAX_STATS_FIELDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_STATS_FIELDS} fields can be aggregated")
+    if any(not name for name in field):
+        raise HTTPException(status_code=400, detail="Field names must not be empty")
+    fields = list(dict.fromkeys(field))  # Drop duplicates, keep the requested order
+    stats = await spatial_service.get_polygon_stats(db, polygon_id, bbox, fields, meta_filter)
+    return [
+        PolygonStatsResponse(
+            polygon_id=row[0],
+            name=row[1],
+            point_count=row[2],
+            fields={
+                name: FieldStats(**dict(zip(("sum", "avg", "min", "max"), row[3 + 4 * index:7 + 4 * index])))
+                for index, name in enumerate(fields)
+            }
+        ) for row in stats
+    ]
+
+@router.get(
+    "/overlaps",
+    response_class=StreamingResponse,
+    summary="Stream all pairs of overlapping polygons (NDJSON)"
+)
+async def stream_overlapping_pairs(
+    with_area: bool = Query(False, description="Include the intersection area of each pair in square meters"),
+    meta_filter: Optional[Dict[str, Any]] = Depends(metadata_filter)
+):
+    """
+    Stream every pair of overlapping polygons as newline-delimited JSON
+    (`{"polygon_a": 1, "polygon_b": 2}` with `polygon_a < polygon_b`).
+
+    All pairs come from a single self-join that uses the spatial index (`&&`) before
+    ST_Overlaps, instead of one `/overlapping-polygons/{polygon_id}` call per polygon. With the
+    metadata filters (`meta`, `meta_eq`) only pairs whose polygons both match are returned.
+    For large tables, `python manage.py overlap-audit` can split the join into concurrent
+    spatial partitions and write Parquet.
+    """
+    return StreamingResponse(
+        overlaps_service.stream_overlap_pairs_ndjson(with_area, meta_filter=meta_filter),
+        media_type="application/x-ndjson"
+    )
@@ -1,5 +1,12 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal
+from enum import Enum
+from datetime import datetime
+
+class ExportTable(str, Enum):
+    """Tables available for GeoParquet export"""
+    points = "points"
+    polygons = "polygons"
 
 class PointCreate(BaseModel):
     """Schema for creating a point"""
@@ -14,6 +21,49 @@ class PolygonCreate(BaseModel):
     coordinates: List[List[float]] = Field(..., description="List of [longitude, latitude] pairs forming a polygon")
     metadata: Optional[Dict[str, Any]] = Field(None, description="Additional data about the polygon")
 
+class MetadataPatch(BaseModel):
+    """Schema for a bulk metadata patch"""
+    metadata: Dict[str, Any] = Field(..., description="Keys merged into (and overwriting) the existing top-level metadata keys")
+
+class BulkMutationResponse(BaseModel):
+    """Schema for the result of a bulk update or delete"""
+    count: int
+    ids: List[int]
+
+class ClusterResponse(BaseModel):
+    """Schema for a cluster of points"""
+    longitude: float
+    latitude: float
+    count: int
+    point_id: Optional[int] = Field(None, description="ID of the point when the cluster holds a single point")
+
+class ClustersResponse(BaseModel):
+    """Schema for the point clusters of a map view"""
+    zoom: int
+    bbox: List[float] = Field(..., description="Tile-aligned [min_lon, min_lat, max_lon, max_lat] the clusters cover")
+    clusters: List[ClusterResponse]
+
+class FieldStats(BaseModel):
+    """Schema for aggregates of one numeric metadata field; None when no point has a numeric value for it"""
+    sum: Optional[float]
+    avg: Optional[float]
+    min: Optional[float]
+    max: Optional[float]
+
+class PolygonStatsResponse(BaseModel):
+    """Schema for the aggregate statistics of the points within a polygon"""
+    polygon_id: int
+    name: str
+    point_count: int
+    fields: Dict[str, FieldStats] = Field(default_factory=dict, description="Aggregates per requested metadata field")
+
+class GeofenceEvent(BaseModel):
+    """Schema for a point entering or leaving a polygon"""
+    event: Literal["enter", "exit"]
+    point_id: int
+    polygon_id: int
+    occurred_at: datetime
+
 class PointResponse(BaseModel):
     """Schema for point response"""
     id: int
@@ -0,0 +1,63 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from app.config import settings
+
+class QueryCache:
+    """
+    In-process LRU cache with a TTL for results derived from the database.
+
+    Writers call clear() to invalidate. Each worker process has its own cache, so an
+    invalidation only reaches the worker that handled the write; the TTL bounds how stale
+    the other workers can get.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None if it is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, generation: int):
+        """
+        Store a value computed while the cache was at `generation`.
+        Values computed before the latest invalidation are dropped instead of stored.
+        """
+        if generation != self.generation:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Invalidate every entry"""
+        self.generation += 1
+        self._entries.clear()
+
+# Point clusters keyed by (zoom, tile-aligned bbox, metadata filter)
+cluster_cache = QueryCache(settings.CLUSTER_CACHE_MAX_ENTRIES, settings.CLUSTER_CACHE_TTL_SECONDS)
+
+# Polygon statistics keyed by (polygon ids, bbox, fields, metadata filter)
+polygon_stats_cache = QueryCache(settings.POLYGON_STATS_CACHE_MAX_ENTRIES, settings.POLYGON_STATS_CACHE_TTL_SECONDS)
+
+def invalidate_point_caches():
+    """Drop every cached result derived from the points table"""
+    cluster_cache.clear()
+    polygon_stats_cache.clear()
+
+def invalidate_polygon_caches():
+    """Drop every cached result derived from the polygons table"""
+    polygon_stats_cache.clear()
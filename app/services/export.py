@@ -0,0 +1,159 @@
+import asyncio
+import io
+import json
+import logging
+import math
+import os
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import pyarrow as pa
+import pyarrow.parquet as pq
+from app.config import settings
+from app.db import async_session
+from app.repository import export as export_repo
+
+logger = logging.getLogger(__name__)
+
+# GeoParquet geometry types for each exportable table
+GEOMETRY_TYPES = {
+    "points": ["Point"],
+    "polygons": ["Polygon"],
+}
+
+def geoparquet_schema(table: str) -> pa.Schema:
+    """Build the Arrow schema, including the GeoParquet "geo" metadata, for a table export."""
+    geo_metadata = {
+        "version": "1.0.0",
+        "primary_column": "geometry",
+        "columns": {
+            # No "crs" key: GeoParquet then defaults to OGC:CRS84, i.e. WGS84 in lon/lat order,
+            # which is exactly how geometries are stored with SRID 4326.
+            "geometry": {
+                "encoding": "WKB",
+                "geometry_types": GEOMETRY_TYPES[table],
+            }
+        },
+    }
+    return pa.schema(
+        [
+            pa.field("id", pa.int64(), nullable=False),
+            pa.field("name", pa.string(), nullable=False),
+            pa.field("meta", pa.string()),  # JSON text, the metadata has no fixed schema
+            pa.field("geometry", pa.binary(), nullable=False),
+        ],
+        metadata={b"geo": json.dumps(geo_metadata).encode("utf-8")},
+    )
+
+def rows_to_record_batch(rows: List[tuple], schema: pa.Schema) -> pa.RecordBatch:
+    """Convert (id, name, meta, geometry) rows into an Arrow record batch."""
+    ids, names, metas, geometries = zip(*rows)
+    return pa.record_batch(
+        [
+            pa.array(ids, type=pa.int64()),
+            pa.array(names, type=pa.string()),
+            pa.array(metas, type=pa.string()),
+            pa.array(geometries, type=pa.binary()),
+        ],
+        schema=schema,
+    )
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that keeps only the bytes written since the last drain()."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def stream_geoparquet(table: str, bbox: Optional[tuple] = None, batch_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Stream a table as a GeoParquet file, one row group per batch.
+
+    Uses its own session so it can outlive the request dependency while the response streams.
+    """
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    schema = geoparquet_schema(table)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async with async_session() as session:
+            async for rows in export_repo.stream_table_rows(session, table, batch_size, bbox):
+                # Encoding and compressing a row group is CPU work, keep it off the event loop
+                await asyncio.to_thread(writer.write_batch, rows_to_record_batch(rows, schema))
+                yield sink.drain()
+    except BaseException:
+        writer.close()
+        raise
+    await asyncio.to_thread(writer.close)  # Writes the footer
+    yield sink.drain()
+
+def split_id_range(min_id: int, max_id: int, partitions: int) -> List[Tuple[int, int]]:
+    """Split the inclusive id range [min_id, max_id] into at most `partitions` half-open ranges."""
+    step = max(1, math.ceil((max_id - min_id + 1) / partitions))
+    return [(start, min(start + step, max_id + 1)) for start in range(min_id, max_id + 1, step)]
+
+async def _export_partition(
+    table: str,
+    path: str,
+    batch_size: int,
+    bbox: Optional[tuple],
+    id_range: Optional[Tuple[int, int]],
+) -> int:
+    """Write one id range of a table to a GeoParquet file and return the number of rows written."""
+    schema = geoparquet_schema(table)
+    rows_written = 0
+    writer = pq.ParquetWriter(path, schema)
+    try:
+        async with async_session() as session:
+            async for rows in export_repo.stream_table_rows(session, table, batch_size, bbox, id_range):
+                # Encoding and writing release the GIL, so partitions overlap their file IO
+                await asyncio.to_thread(writer.write_batch, rows_to_record_batch(rows, schema))
+                rows_written += len(rows)
+    finally:
+        writer.close()
+    return rows_written
+
+async def export_table(
+    table: str,
+    out_dir: str,
+    bbox: Optional[tuple] = None,
+    batch_size: Optional[int] = None,
+    partitions: int = 1,
+) -> Dict[str, int]:
+    """
+    Export a table to GeoParquet files in out_dir, running `partitions` id ranges concurrently.
+
+    Returns a mapping of written file path to row count.
+    """
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    os.makedirs(out_dir, exist_ok=True)
+
+    async with async_session() as session:
+        bounds = await export_repo.get_id_bounds(session, table, bbox)
+    # An empty selection still produces a single (empty) file so snapshots are always complete
+    id_ranges = split_id_range(bounds[0], bounds[1], partitions) if bounds else [None]
+
+    paths = [os.path.join(out_dir, f"{table}-part-{index:04d}.parquet") for index in range(len(id_ranges))]
+    counts = await asyncio.gather(
+        *(
+            _export_partition(table, path, batch_size, bbox, id_range)
+            for path, id_range in zip(paths, id_ranges)
+        )
+    )
+    logger.info(f"Exported {sum(counts)} {table} rows to {len(paths)} file(s) in {out_dir}")
+    return dict(zip(paths, counts))
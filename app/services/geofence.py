@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.db import engine
+from app.repository import membership as membership_repo
+from app.schemas import GeofenceEvent
+
+logger = logging.getLogger(__name__)
+
+class GeofenceSubscription:
+    """A subscriber's event queue, optionally limited to some points and/or polygons"""
+
+    def __init__(self, point_ids: Optional[Set[int]], polygon_ids: Optional[Set[int]], queue_size: int):
+        self.point_ids = point_ids
+        self.polygon_ids = polygon_ids
+        self.queue: "asyncio.Queue[GeofenceEvent]" = asyncio.Queue(maxsize=queue_size)
+
+    def matches(self, event: GeofenceEvent) -> bool:
+        if self.point_ids is not None and event.point_id not in self.point_ids:
+            return False
+        if self.polygon_ids is not None and event.polygon_id not in self.polygon_ids:
+            return False
+        return True
+
+    def offer(self, event: GeofenceEvent):
+        """Queue an event without blocking the writer; a slow subscriber loses its oldest events"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            logger.warning("Geofence subscriber queue full, dropping the oldest event")
+        self.queue.put_nowait(event)
+
+# PostgreSQL NOTIFY channel carrying geofence events between server processes
+GEOFENCE_CHANNEL = "geofence_events"
+
+# Seconds to wait before re-establishing a lost LISTEN connection
+LISTEN_RECONNECT_SECONDS = 5
+
+class GeofenceBroker:
+    """
+    Fans geofence events out to the subscribers connected to this process.
+    Events reach it through GeofenceListener, whichever process handled the write.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscriptions: List[GeofenceSubscription] = []
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    def subscribe(self, point_ids: Optional[Set[int]] = None, polygon_ids: Optional[Set[int]] = None) -> GeofenceSubscription:
+        subscription = GeofenceSubscription(point_ids, polygon_ids, self.queue_size)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: GeofenceSubscription):
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+
+    def publish(self, events: List[GeofenceEvent]):
+        for event in events:
+            for subscription in self._subscriptions:
+                if subscription.matches(event):
+                    subscription.offer(event)
+
+geofence_broker = GeofenceBroker(settings.GEOFENCE_SUBSCRIBER_QUEUE_SIZE)
+
+def diff_memberships(previous: Dict[int, Set[int]], current: Dict[int, Set[int]]) -> List[GeofenceEvent]:
+    """Turn the polygon memberships of points before and after a write into enter/exit events"""
+    occurred_at = datetime.now(timezone.utc)
+    events = []
+    for point_id in sorted(previous.keys() | current.keys()):
+        before = previous.get(point_id, set())
+        after = current.get(point_id, set())
+        events.extend(
+            GeofenceEvent(event="exit", point_id=point_id, polygon_id=polygon_id, occurred_at=occurred_at)
+            for polygon_id in sorted(before - after)
+        )
+        events.extend(
+            GeofenceEvent(event="enter", point_id=point_id, polygon_id=polygon_id, occurred_at=occurred_at)
+            for polygon_id in sorted(after - before)
+        )
+    return events
+
+async def publish_membership_changes(db: AsyncSession, point_ids: List[int], previous: Dict[int, Set[int]]):
+    """
+    Read the memberships of freshly written (uncommitted) points, which the repository refreshed
+    in the same transaction, and queue a NOTIFY of the enter/exit events relative to `previous`.
+    NOTIFY is only delivered if the transaction commits, to every process listening on
+    GEOFENCE_CHANNEL, including this one.
+    """
+    current = await membership_repo.get_point_memberships(db, point_ids) if point_ids else {}
+    events = diff_memberships(previous, current)
+    if events:
+        await db.execute(
+            text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+            {"channel": GEOFENCE_CHANNEL, "payloads": [event.model_dump_json() for event in events]},
+        )
+
+async def commit_and_publish(db: AsyncSession, point_ids: List[int], previous: Dict[int, Set[int]]):
+    """Commit freshly written points together with the NOTIFY of their enter/exit events"""
+    await publish_membership_changes(db, point_ids, previous)
+    await db.commit()
+
+class GeofenceListener:
+    """LISTENs on GEOFENCE_CHANNEL on a dedicated connection and hands the events to the broker"""
+
+    def __init__(self, broker: GeofenceBroker):
+        self.broker = broker
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _on_notification(self, connection, pid, channel, payload: str):
+        if self.broker.has_subscribers:
+            self.broker.publish([GeofenceEvent.model_validate_json(payload)])
+
+    async def _run(self):
+        while True:
+            try:
+                async with engine.connect() as conn:
+                    driver_connection = (await conn.get_raw_connection()).driver_connection
+                    lost = asyncio.Event()
+                    driver_connection.add_termination_listener(lambda _: lost.set())
+                    await driver_connection.add_listener(GEOFENCE_CHANNEL, self._on_notification)
+                    try:
+                        await lost.wait()
+                    finally:
+                        if not driver_connection.is_closed():
+                            await driver_connection.remove_listener(GEOFENCE_CHANNEL, self._on_notification)
+                logger.warning("Geofence LISTEN connection lost, reconnecting")
+            except Exception:
+                logger.exception("Geofence LISTEN connection failed, retrying")
+            await asyncio.sleep(LISTEN_RECONNECT_SECONDS)
+
+geofence_listener = GeofenceListener(geofence_broker)
@@ -2,24 +2,39 @@ import aiohttp
 import io
 import logging
 import traceback
-import matplotlib.pyplot as plt
-import geopandas as gpd
 from shapely.geometry import Polygon
 from io import BytesIO
 from app.config import settings
 from app.repository import spatial as spatial_repo # Import spatial repository
 from sqlalchemy.ext.asyncio import AsyncSession # Import AsyncSession for type hint
-from PIL import Image
-from typing import Optional
-
+from typing import Optional, TYPE_CHECKING
 
+# matplotlib, GeoPandas and Pillow are heavy to import, so they are loaded on first use
+# (or by prewarm()) instead of in every worker at startup
+if TYPE_CHECKING:
+    import geopandas as gpd
 
 logger = logging.getLogger(__name__)
 
+def _pyplot():
+    """Import pyplot with the non-interactive Agg backend (workers have no display)"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def prewarm():
+    """Load the rendering stack ahead of the first request, e.g. from the application's lifespan"""
+    _pyplot()
+    import geopandas  # noqa: F401
+    from PIL import Image  # noqa: F401
+
 async def upload_to_imgur(image_data: bytes, title: str = "Simple upload", description: str = "This is a simple image upload in Imgur") -> str | None:
     """Uploads image data to Imgur and returns the link, or None on failure."""
     headers = {'Authorization': f"Client-ID {settings.IMGUR_CLIENT_ID}"}
     try:
+        from PIL import Image
+
         # Ensure image is in JPEG format using Pillow
         img = Image.open(io.BytesIO(image_data))
         if img.format != 'JPEG':
@@ -54,6 +69,8 @@ def generate_polygon_image(coordinates: list, title: str = "Polygon Visualizatio
     try:
         if not coordinates:
             return None
+        import geopandas as gpd
+        plt = _pyplot()
 
         polygon_geom = Polygon(coordinates)
         gdf = gpd.GeoDataFrame([1], geometry=[polygon_geom], crs="EPSG:4326")
@@ -83,11 +100,12 @@ def generate_polygon_image(coordinates: list, title: str = "Polygon Visualizatio
         logger.error(f"Error generating polygon image: {str(e)}\n{traceback.format_exc()}")
         return None
 
-def generate_points_map_image(gdf: gpd.GeoDataFrame, title: str = "Map Image") -> bytes | None:
+def generate_points_map_image(gdf: "gpd.GeoDataFrame", title: str = "Map Image") -> bytes | None:
     """Generates a JPEG image visualizing points from a GeoDataFrame."""
     if gdf.empty:
         return None
     try:
+        plt = _pyplot()
         fig, ax = plt.subplots(figsize=(10, 10))
         gdf.plot(ax=ax, marker='o', color='blue', markersize=5)
 
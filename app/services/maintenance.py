@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from app.db import async_session
+from app.repository import maintenance as maintenance_repo
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_KEYS = tuple(maintenance_repo.CLUSTER_INDEXES)
+
+async def get_storage_health() -> Dict[str, Any]:
+    """Collect table, index and clustering statistics for the health report"""
+    async with async_session() as session:
+        return {
+            "tables": await maintenance_repo.get_table_health(session),
+            "indexes": await maintenance_repo.get_index_health(session),
+            "geohash_correlation": await maintenance_repo.get_geohash_correlation(session),
+        }
+
+async def run_storage_maintenance(key: Optional[str] = "geohash") -> Optional[Dict[str, Any]]:
+    """
+    Cluster points by `key` (or skip clustering when key is None), ANALYZE the spatial tables
+    and return the health report. Returns None without doing anything if another process
+    is already running maintenance.
+    """
+    async with async_session() as session:
+        if not await maintenance_repo.try_lock_maintenance(session):
+            logger.info("Storage maintenance is already running elsewhere, skipping")
+            return None
+        if key is not None:
+            logger.info(f"Clustering points by {key}")
+            await maintenance_repo.cluster_points(session, key)
+        await maintenance_repo.analyze_tables(session)
+        await session.commit()
+    return await get_storage_health()
+
+def _megabytes(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} MB"
+
+def format_health_report(report: Dict[str, Any]) -> List[str]:
+    """Render a health report as human readable lines"""
+    lines = []
+    for table in report["tables"]:
+        total = table["live_rows"] + table["dead_rows"]
+        dead_percent = 100 * table["dead_rows"] / total if total else 0.0
+        lines.append(
+            f"{table['table']}: {table['live_rows']} live rows, {table['dead_rows']} dead ({dead_percent:.1f}%), "
+            f"table {_megabytes(table['table_bytes'])}, indexes {_megabytes(table['index_bytes'])}, "
+            f"last vacuum {table['last_vacuum'] or 'never'}, last analyze {table['last_analyze'] or 'never'}"
+        )
+    for index in report["indexes"]:
+        free = f", {index['free_percent']:.1f}% free" if index["free_percent"] is not None else ""
+        clustered = ", clustered on" if index["clustered_on"] else ""
+        lines.append(
+            f"  {index['table']}.{index['index']} ({index['method']}): {_megabytes(index['index_bytes'])}, "
+            f"{index['scans']} scans{free}{clustered}"
+        )
+    correlation = report["geohash_correlation"]
+    lines.append(
+        f"points geohash correlation: {correlation:.3f}" if correlation is not None
+        else "points geohash correlation: unknown (points were never clustered by geohash)"
+    )
+    return lines
+
+async def storage_maintenance_loop(interval_seconds: float, key: Optional[str]):
+    """Background task running storage maintenance every interval_seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            report = await run_storage_maintenance(key)
+        except Exception:
+            logger.exception("Scheduled storage maintenance failed")
+            continue
+        if report is not None:
+            for line in format_health_report(report):
+                logger.info(line)
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import logging
+import math
+from typing import Any, AsyncIterator, Dict, List, Optional
+import pyarrow as pa
+import pyarrow.parquet as pq
+from app.config import settings
+from app.db import async_session
+from app.repository import spatial as spatial_repo
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = ("ndjson", "parquet")
+
+def pair_to_dict(pair: tuple) -> dict:
+    """Convert an (a_id, b_id[, area]) overlap pair into its NDJSON object"""
+    record = {"polygon_a": pair[0], "polygon_b": pair[1]}
+    if len(pair) > 2:
+        record["intersection_area_m2"] = pair[2]
+    return record
+
+def pairs_schema(with_area: bool) -> pa.Schema:
+    fields = [pa.field("polygon_a", pa.int64(), nullable=False), pa.field("polygon_b", pa.int64(), nullable=False)]
+    if with_area:
+        fields.append(pa.field("intersection_area_m2", pa.float64()))
+    return pa.schema(fields)
+
+def pairs_to_record_batch(pairs: List[tuple], schema: pa.Schema) -> pa.RecordBatch:
+    columns = list(zip(*pairs))
+    return pa.record_batch(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+def spatial_tiles(extent: tuple, partitions: int) -> List[tuple]:
+    """
+    Split an extent into a grid of about `partitions` tiles, as accepted by stream_overlapping_pairs.
+    Tiles on the max edges are closed so pairs cornered exactly on the extent's edge are kept.
+    """
+    min_lon, min_lat, max_lon, max_lat = extent
+    columns = math.ceil(math.sqrt(partitions))
+    rows = math.ceil(partitions / columns)
+    width = (max_lon - min_lon) / columns
+    height = (max_lat - min_lat) / rows
+    tiles = []
+    for row in range(rows):
+        for column in range(columns):
+            last_column, last_row = column == columns - 1, row == rows - 1
+            tiles.append((
+                min_lon + column * width,
+                min_lat + row * height,
+                max_lon if last_column else min_lon + (column + 1) * width,
+                max_lat if last_row else min_lat + (row + 1) * height,
+                last_column,
+                last_row,
+            ))
+    return tiles
+
+async def stream_overlap_pairs_ndjson(
+    with_area: bool = False,
+    batch_size: Optional[int] = None,
+    meta_filter: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Stream all overlapping polygon pairs as NDJSON, one line per pair, optionally only pairs
+    of polygons whose metadata both contain meta_filter.
+    Uses its own session so it can outlive the request dependency while the response streams.
+    """
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    async with async_session() as session:
+        async for pairs in spatial_repo.stream_overlapping_pairs(session, batch_size, with_area, meta_filter=meta_filter):
+            yield "".join(json.dumps(pair_to_dict(pair)) + "\n" for pair in pairs).encode("utf-8")
+
+async def _audit_partition(tile: Optional[tuple], with_area: bool, batch_size: int, write_batch) -> int:
+    count = 0
+    async with async_session() as session:
+        async for pairs in spatial_repo.stream_overlapping_pairs(session, batch_size, with_area, tile):
+            write_batch(pairs)
+            count += len(pairs)
+    return count
+
+async def run_overlap_audit(
+    out_path: str,
+    output_format: str = "ndjson",
+    with_area: bool = False,
+    partitions: int = 1,
+    batch_size: Optional[int] = None,
+) -> int:
+    """
+    Write every overlapping polygon pair to out_path as NDJSON or Parquet and return the pair count.
+
+    With partitions > 1 the polygon extent is split into spatial tiles whose self-joins run
+    concurrently, each on its own connection; every pair is found by exactly one tile.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}, expected one of {OUTPUT_FORMATS}")
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+
+    tiles: List[Optional[tuple]] = [None]
+    if partitions > 1:
+        async with async_session() as session:
+            extent = await spatial_repo.get_polygon_extent(session)
+        if extent is not None:
+            tiles = spatial_tiles(extent, partitions)
+
+    # Partitions share one output; batches are written from the event loop, one at a time
+    if output_format == "parquet":
+        schema = pairs_schema(with_area)
+        writer = pq.ParquetWriter(out_path, schema)
+
+        def write_batch(pairs: List[tuple]):
+            writer.write_batch(pairs_to_record_batch(pairs, schema))
+        close = writer.close
+    else:
+        out_file = open(out_path, "w", encoding="utf-8")
+
+        def write_batch(pairs: List[tuple]):
+            out_file.writelines(json.dumps(pair_to_dict(pair)) + "\n" for pair in pairs)
+        close = out_file.close
+
+    try:
+        counts = await asyncio.gather(
+            *(_audit_partition(tile, with_area, batch_size, write_batch) for tile in tiles)
+        )
+    finally:
+        close()
+    logger.info(f"Found {sum(counts)} overlapping polygon pairs using {len(tiles)} partition(s), written to {out_path}")
+    return sum(counts)
@@ -0,0 +1,116 @@
+import asyncio
+import contextvars
+import logging
+from typing import List, Optional, Set, Tuple
+from app.config import settings
+from app.db import async_session
+from app.models import PointDB
+from app.repository import points as points_repo
+from app.schemas import PointCreate
+from app.services.cache import invalidate_point_caches
+from app.services import geofence as geofence_service
+
+logger = logging.getLogger(__name__)
+
+class PointWriteBatcher:
+    """
+    Coalesces concurrent point creates into one multi-row INSERT ... RETURNING and one commit.
+
+    Each caller awaits its own future and gets back its own row, so callers see the same
+    result as an individual create_point, only with up to `window_seconds` of added latency.
+    Flushes run in an empty context, so their statements aren't counted against whichever
+    request happened to start the batch.
+    """
+
+    def __init__(self, window_seconds: float, max_batch_size: int):
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self._pending: List[Tuple[PointCreate, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def submit(self, point: PointCreate) -> PointDB:
+        """Queue a point for the next batch and wait until it has been committed"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((point, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._start_flush, context=contextvars.Context())
+        return await future
+
+    def _start_flush(self):
+        """Hand the pending points over to a flush task"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._flush(batch), context=contextvars.Context())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write(self, session, points: List[PointCreate]) -> List[PointDB]:
+        """Insert the points and queue their geofence events, leaving the transaction to be committed"""
+        db_points = await points_repo.create_points(session, points, commit=False)
+        if settings.GEOFENCE_EVENTS:
+            await geofence_service.publish_membership_changes(
+                session, [db_point.id for db_point in db_points], previous={}
+            )
+        return db_points
+
+    async def _flush(self, batch: List[Tuple[PointCreate, asyncio.Future]]):
+        try:
+            async with async_session() as session:
+                try:
+                    db_points = await self._write(session, [point for point, _ in batch])
+                except Exception as e:
+                    # Don't let one bad row fail everyone else in the batch: retry them one by one
+                    logger.warning(f"Batched insert of {len(batch)} points failed, retrying individually: {str(e)}")
+                    db_points = None
+                else:
+                    try:
+                        await session.commit()
+                    except Exception as e:
+                        # The rows may have been saved anyway, retrying them could insert them twice
+                        logger.warning(f"Commit of a batch of {len(batch)} points failed: {str(e)}")
+                        for _, future in batch:
+                            if not future.done():
+                                future.set_exception(e)
+                        return
+            if db_points is None:
+                await self._flush_individually(batch)
+                return
+            invalidate_point_caches()
+            for (_, future), db_point in zip(batch, db_points):
+                if not future.done():
+                    future.set_result(db_point)
+        finally:
+            # Only reached with unresolved futures when the flush was cancelled, e.g. on shutdown
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Point insert was interrupted, it may or may not have been saved"))
+
+    async def _flush_individually(self, batch: List[Tuple[PointCreate, asyncio.Future]]):
+        for point, future in batch:
+            try:
+                async with async_session() as session:
+                    db_point, = await self._write(session, [point])
+                    await session.commit()
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            if not future.done():
+                future.set_result(db_point)
+        invalidate_point_caches()
+
+    async def drain(self):
+        """Flush whatever is pending and wait for every in-flight batch, e.g. on shutdown"""
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+point_batcher = PointWriteBatcher(settings.POINT_BATCH_WINDOW_MS / 1000, settings.POINT_BATCH_MAX_SIZE)
@@ -1,24 +1,69 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.repository import points as points_repo
+from app.repository import membership as membership_repo
 from app.schemas import PointCreate
-from typing import List, Optional
+from app.services.cache import invalidate_point_caches
+from app.services.point_batcher import point_batcher
+from app.services import geofence as geofence_service
+from app.config import settings
+from typing import Any, Dict, List, Optional
 
 async def create_point(db: AsyncSession, point: PointCreate):
-    """Service function to create a new point"""
-    return await points_repo.create_point(db, point)
+    """
+    Service function to create a new point.
+    With POINT_WRITE_BATCHING enabled, concurrent creates share one INSERT and commit.
+    With GEOFENCE_EVENTS enabled, the polygons the point enters are evaluated in the same transaction.
+    """
+    if settings.POINT_WRITE_BATCHING:
+        return await point_batcher.submit(point)
+    track_geofences = settings.GEOFENCE_EVENTS
+    db_point = await points_repo.create_point(db, point, commit=not track_geofences)
+    if track_geofences:
+        await geofence_service.commit_and_publish(db, [db_point.id], previous={})
+    invalidate_point_caches()
+    return db_point
 
 async def get_point(db: AsyncSession, point_id: int):
     """Service function to get a point by ID"""
     return await points_repo.get_point(db, point_id)
 
-async def get_all_points(db: AsyncSession, skip: int = 0, limit: int = 100):
+async def get_all_points(db: AsyncSession, skip: int = 0, limit: int = 100, meta_filter: Optional[Dict[str, Any]] = None, as_rows: bool = False):
     """Service function to get all points with pagination"""
-    return await points_repo.get_all_points(db, skip, limit)
+    return await points_repo.get_all_points(db, skip, limit, meta_filter, as_rows)
 
 async def update_point(db: AsyncSession, point_id: int, point: PointCreate):
-    """Service function to update a point"""
-    return await points_repo.update_point(db, point_id, point)
+    """
+    Service function to update a point.
+    With GEOFENCE_EVENTS enabled, the polygons containing the point before and after the
+    update are evaluated in the same transaction and published as enter/exit events.
+    """
+    if not settings.GEOFENCE_EVENTS:
+        db_point = await points_repo.update_point(db, point_id, point)
+        invalidate_point_caches()
+        return db_point
+
+    # The membership locks come before the row lock, in the same order as every other write
+    await points_repo.lock_for_point_update(db, point_id, point)
+    previous = await membership_repo.get_point_memberships(db, [point_id], lock=True)
+    db_point = await points_repo.update_point(db, point_id, point, commit=False)
+    await geofence_service.commit_and_publish(db, [point_id] if db_point else [], previous)
+    invalidate_point_caches()
+    return db_point
 
 async def delete_point(db: AsyncSession, point_id: int):
     """Service function to delete a point"""
-    return await points_repo.delete_point(db, point_id) 
\ No newline at end of file
+    deleted = await points_repo.delete_point(db, point_id)
+    invalidate_point_caches()
+    return deleted
+
+async def delete_points_matching(db: AsyncSession, bbox: Optional[tuple] = None, polygon_id: Optional[int] = None) -> List[int]:
+    """Service function to delete all points within a bbox and/or polygon"""
+    deleted_ids = await points_repo.delete_points_matching(db, bbox, polygon_id)
+    invalidate_point_caches()
+    return deleted_ids
+
+async def patch_points_metadata(db: AsyncSession, metadata: Dict[str, Any], bbox: Optional[tuple] = None, polygon_id: Optional[int] = None) -> List[int]:
+    """Service function to merge metadata into all points within a bbox and/or polygon"""
+    updated_ids = await points_repo.patch_points_metadata(db, metadata, bbox, polygon_id)
+    invalidate_point_caches()
+    return updated_ids
@@ -4,11 +4,13 @@ from app.repository import polygons as polygons_repo
 from app.schemas import PolygonCreate
 from app.models import PolygonDB
 from app.services import image_service
-from typing import Tuple, Optional, List
+from app.services.cache import invalidate_polygon_caches
+from typing import Any, Dict, Tuple, Optional, List
 
 async def create_polygon(db: AsyncSession, polygon: PolygonCreate) -> Tuple[PolygonDB, Optional[str]]:
     """Creates a polygon, generates/uploads image, returns polygon object and image URL."""
     db_polygon = await polygons_repo.create_polygon(db, polygon)
+    invalidate_polygon_caches()
     image_url = None
     if db_polygon:
         polygon_shape = to_shape(db_polygon.geom)
@@ -36,14 +38,15 @@ async def get_polygon(db: AsyncSession, polygon_id: int) -> Tuple[Optional[Polyg
             )
     return db_polygon, image_url
 
-async def get_all_polygons(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[PolygonDB]:
+async def get_all_polygons(db: AsyncSession, skip: int = 0, limit: int = 100, meta_filter: Optional[Dict[str, Any]] = None, as_rows: bool = False) -> List[PolygonDB]:
     """Gets all polygons with pagination (no image generation for list)."""
     # No image generation here for performance reasons
-    return await polygons_repo.get_all_polygons(db, skip, limit)
+    return await polygons_repo.get_all_polygons(db, skip, limit, meta_filter, as_rows)
 
 async def update_polygon(db: AsyncSession, polygon_id: int, polygon: PolygonCreate) -> Tuple[Optional[PolygonDB], Optional[str]]:
     """Updates a polygon, generates/uploads image, returns updated polygon object and image URL."""
     db_polygon = await polygons_repo.update_polygon(db, polygon_id, polygon)
+    invalidate_polygon_caches()
     image_url = None
     if db_polygon:
         polygon_shape = to_shape(db_polygon.geom)
@@ -59,4 +62,18 @@ async def update_polygon(db: AsyncSession, polygon_id: int, polygon: PolygonCrea
 async def delete_polygon(db: AsyncSession, polygon_id: int) -> bool:
     """Deletes a polygon."""
     # No image generation needed for delete
-    return await polygons_repo.delete_polygon(db, polygon_id) 
\ No newline at end of file
+    deleted = await polygons_repo.delete_polygon(db, polygon_id)
+    invalidate_polygon_caches()
+    return deleted
+
+async def delete_polygons_matching(db: AsyncSession, bbox: Optional[tuple] = None, polygon_id: Optional[int] = None) -> List[int]:
+    """Deletes all polygons within a bbox and/or another polygon."""
+    deleted_ids = await polygons_repo.delete_polygons_matching(db, bbox, polygon_id)
+    invalidate_polygon_caches()
+    return deleted_ids
+
+async def patch_polygons_metadata(db: AsyncSession, metadata: Dict[str, Any], bbox: Optional[tuple] = None, polygon_id: Optional[int] = None) -> List[int]:
+    """Merges metadata into all polygons within a bbox and/or another polygon (no image generation)."""
+    patched_ids = await polygons_repo.patch_polygons_metadata(db, metadata, bbox, polygon_id)
+    invalidate_polygon_caches()
+    return patched_ids
@@ -1,18 +1,120 @@
+import json
+import math
+from typing import Any, Dict, List, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.repository import spatial as spatial_repo
+from app.repository import membership as membership_repo
+from app.services.cache import cluster_cache, polygon_stats_cache
+from app.config import settings
 
-async def get_points_in_polygon(db: AsyncSession, polygon_id: int):
+async def get_points_in_polygon(db: AsyncSession, polygon_id: int, meta_filter: Optional[Dict[str, Any]] = None, as_rows: bool = False):
     """Service function to get all points within a polygon"""
-    return await spatial_repo.get_points_in_polygon(db, polygon_id)
+    return await spatial_repo.get_points_in_polygon(db, polygon_id, meta_filter, as_rows)
 
-async def get_points_near(db: AsyncSession, point_id: int, radius_meters: float):
+async def get_points_near(db: AsyncSession, point_id: int, radius_meters: float, meta_filter: Optional[Dict[str, Any]] = None, as_rows: bool = False):
     """Service function to get all points within a radius of another point"""
-    return await spatial_repo.get_points_near(db, point_id, radius_meters)
+    return await spatial_repo.get_points_near(db, point_id, radius_meters, meta_filter, as_rows)
 
-async def get_polygons_containing_point(db: AsyncSession, point_id: int):
+async def get_polygons_containing_point(db: AsyncSession, point_id: int, meta_filter: Optional[Dict[str, Any]] = None, as_rows: bool = False):
     """Service function to get all polygons containing a point"""
-    return await spatial_repo.get_polygons_containing_point(db, point_id)
+    return await spatial_repo.get_polygons_containing_point(db, point_id, meta_filter, as_rows)
 
-async def get_overlapping_polygons(db: AsyncSession, polygon_id: int):
+async def get_overlapping_polygons(db: AsyncSession, polygon_id: int, meta_filter: Optional[Dict[str, Any]] = None, as_rows: bool = False):
     """Service function to get all polygons that overlap with a polygon"""
-    return await spatial_repo.get_overlapping_polygons(db, polygon_id) 
\ No newline at end of file
+    return await spatial_repo.get_overlapping_polygons(db, polygon_id, meta_filter, as_rows)
+
+# Latitude limit of the square Web Mercator world, beyond it there are no map tiles
+MERCATOR_MAX_LATITUDE = 85.0511287798066
+
+def _tile_x(longitude: float, tiles: int) -> int:
+    return min(tiles - 1, max(0, math.floor((longitude + 180.0) / 360.0 * tiles)))
+
+def _tile_y(latitude: float, tiles: int) -> int:
+    latitude = min(MERCATOR_MAX_LATITUDE, max(-MERCATOR_MAX_LATITUDE, latitude))
+    y = (1.0 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2.0 * tiles
+    return min(tiles - 1, max(0, math.floor(y)))
+
+def _tile_latitude(y: int, tiles: int) -> float:
+    """Latitude of the northern edge of tile row y"""
+    return math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * y / tiles))))
+
+def tile_range(bbox: tuple, zoom: int) -> Tuple[int, int, int, int]:
+    """Get the (min_x, min_y, max_x, max_y) XYZ tiles covering a bbox at a zoom level; y grows southwards"""
+    tiles = 2 ** zoom
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return _tile_x(min_lon, tiles), _tile_y(max_lat, tiles), _tile_x(max_lon, tiles), _tile_y(min_lat, tiles)
+
+def tile_aligned_bbox(bbox: tuple, zoom: int) -> tuple:
+    """
+    Expand a bbox outwards to the edges of the Web Mercator (XYZ) tiles covering it at a zoom level,
+    the tiles web maps request. Latitudes are clamped to the +/-85.0511 degree Mercator limit.
+    """
+    tiles = 2 ** zoom
+    min_x, min_y, max_x, max_y = tile_range(bbox, zoom)
+    return (
+        min_x / tiles * 360.0 - 180.0,
+        _tile_latitude(max_y + 1, tiles),
+        (max_x + 1) / tiles * 360.0 - 180.0,
+        _tile_latitude(min_y, tiles),
+    )
+
+def cluster_cell_count(bbox: tuple, zoom: int) -> int:
+    """Number of grid cells clustering a bbox at a zoom level would group by"""
+    min_x, min_y, max_x, max_y = tile_range(bbox, zoom)
+    return (max_x - min_x + 1) * (max_y - min_y + 1) * settings.CLUSTER_CELLS_PER_TILE ** 2
+
+async def get_point_clusters(db: AsyncSession, bbox: tuple, zoom: int, meta_filter: Optional[Dict[str, Any]] = None) -> Tuple[tuple, List[tuple]]:
+    """
+    Service function to cluster the points in a bbox for a map zoom level.
+
+    The bbox is widened to whole tiles, and the grid cells are aligned with tile edges,
+    so the result for a tile-aligned bbox is cacheable until the next point write.
+    Returns the tile-aligned bbox and its (count, longitude, latitude, min_id) clusters.
+    """
+    tile_bbox = tile_aligned_bbox(bbox, zoom)
+    cache_key = (zoom, tile_bbox, json.dumps(meta_filter, sort_keys=True))
+    clusters = cluster_cache.get(cache_key)
+    if clusters is None:
+        generation = cluster_cache.generation
+        cell_size = 2 * spatial_repo.MERCATOR_HALF_WORLD / (2 ** zoom) / settings.CLUSTER_CELLS_PER_TILE
+        clusters = await spatial_repo.get_point_clusters(db, tile_bbox, cell_size, meta_filter)
+        cluster_cache.set(cache_key, clusters, generation)
+    return tile_bbox, clusters
+
+async def get_polygon_stats(
+    db: AsyncSession,
+    polygon_ids: Optional[List[int]] = None,
+    bbox: Optional[tuple] = None,
+    fields: Optional[List[str]] = None,
+    meta_filter: Optional[Dict[str, Any]] = None,
+) -> List[tuple]:
+    """Service function to aggregate points per polygon, cached until points or polygons are written"""
+    use_cache = settings.POLYGON_STATS_CACHE_TTL_SECONDS > 0
+    cache_key = (
+        tuple(sorted(set(polygon_ids))) if polygon_ids else None,
+        bbox,
+        tuple(fields or ()),
+        json.dumps(meta_filter, sort_keys=True),
+    )
+    if use_cache:
+        stats = polygon_stats_cache.get(cache_key)
+        if stats is not None:
+            return stats
+    generation = polygon_stats_cache.generation
+    stats = await spatial_repo.get_polygon_stats(db, polygon_ids, bbox, fields, meta_filter)
+    if use_cache:
+        polygon_stats_cache.set(cache_key, stats, generation)
+    return stats
+
+async def rebuild_memberships(db: AsyncSession) -> int:
+    """
+    Service function to rebuild the point-polygon membership table from the geometries and commit,
+    returning its row count. Point and polygon writes wait until it has committed.
+    """
+    count = await membership_repo.rebuild_memberships(db)
+    await db.commit()
+    return count
+
+async def check_memberships(db: AsyncSession) -> Tuple[int, int]:
+    """Service function to count (missing, stale) rows of the point-polygon membership table"""
+    return await membership_repo.check_memberships(db)
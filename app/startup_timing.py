@@ -0,0 +1,27 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+class StartupTimer:
+    """Records how long each startup phase (imports, lifespan steps) takes and logs them as one report"""
+
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started_at))
+
+    def report(self):
+        total = sum(seconds for _, seconds in self.phases)
+        details = ", ".join(f"{name}: {seconds * 1000:.0f} ms" for name, seconds in self.phases)
+        logger.info(f"Startup took {total * 1000:.0f} ms ({details})")
+
+startup_timer = StartupTimer()
@@ -1,14 +1,68 @@
-from fastapi import FastAPI
-from contextlib import asynccontextmanager
-from app.routes import points, polygons, spatial, generate_map_image
-from app.models import Base
-from app.db import engine
+import asyncio
+import logging
+from app.startup_timing import startup_timer
+
+with startup_timer.phase("imports"):
+    from fastapi import FastAPI
+    from contextlib import asynccontextmanager
+    from app.routes import points, polygons, spatial, generate_map_image, export, geofence
+    from app.models import Base, PointPolygonMembershipDB, create_missing_indexes, missing_tables
+    from app.db import engine, async_session
+    from app.middleware import RequestDiagnosticsMiddleware, install_query_counter
+    from app.services.point_batcher import point_batcher
+    from app.services import image_service
+    from app.services import spatial as spatial_service
+    from app.services.maintenance import storage_maintenance_loop
+    from app.services.geofence import geofence_listener
+    from app.config import settings
+
+def configure_logging():
+    """
+    Send the app.* loggers to stderr at LOG_LEVEL. uvicorn only configures its own loggers, so without
+    this records below WARNING (startup timings, maintenance reports, ...) would be dropped.
+    """
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(settings.LOG_LEVEL.upper())
+    if not app_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(levelname)s:     %(name)s - %(message)s"))
+        app_logger.addHandler(handler)
+        app_logger.propagate = False
+
+configure_logging()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        with startup_timer.phase("create tables"):
+            created_tables = await conn.run_sync(missing_tables)
+            await conn.run_sync(Base.metadata.create_all)
+    async with engine.connect() as conn:
+        # Indexes are built concurrently, which needs a connection outside a transaction
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        with startup_timer.phase("create indexes"):
+            await conn.run_sync(create_missing_indexes)
+    if PointPolygonMembershipDB.__tablename__ in created_tables:
+        # Fills the point-polygon membership table on the first start after it was added
+        async with async_session() as session:
+            with startup_timer.phase("backfill memberships"):
+                await spatial_service.rebuild_memberships(session)
+    if settings.PREWARM_RENDERING:
+        with startup_timer.phase("prewarm rendering"):
+            await asyncio.to_thread(image_service.prewarm)
+    startup_timer.report()
+    maintenance_task = None
+    if settings.STORAGE_MAINTENANCE_INTERVAL_HOURS:
+        maintenance_task = asyncio.create_task(storage_maintenance_loop(
+            settings.STORAGE_MAINTENANCE_INTERVAL_HOURS * 3600, settings.STORAGE_CLUSTER_KEY
+        ))
+    if settings.GEOFENCE_EVENTS:
+        geofence_listener.start()
     yield  # Application runs
+    await geofence_listener.stop()
+    if maintenance_task is not None:
+        maintenance_task.cancel()
+    await point_batcher.drain()  # Commit creates still waiting in a batch window
     await engine.dispose()
 
 app = FastAPI(lifespan=lifespan,
@@ -16,10 +70,15 @@ app = FastAPI(lifespan=lifespan,
               description="API for storing, retrieving, and querying spatial data",
               version="1.0.0")
 
+install_query_counter(engine.sync_engine)
+app.add_middleware(RequestDiagnosticsMiddleware)
+
 app.include_router(points.router, prefix="/points", tags=["Points"])
 app.include_router(polygons.router, prefix="/polygons", tags=["Polygons"])
 app.include_router(spatial.router, prefix="/spatial", tags=["Spatial"])
 app.include_router(generate_map_image.router, prefix="/images", tags=["Images"])
+app.include_router(export.router, prefix="/export", tags=["Export"])
+app.include_router(geofence.router, prefix="/geofence", tags=["Geofence"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,128 @@
+"""
+Command line entry point for maintenance jobs that run outside the API server.
+
+Usage:
+    python manage.py export points --out ./snapshots --partitions 4
+    python manage.py rebuild-membership [--check]
+    python manage.py overlap-audit --out overlaps.parquet --format parquet --with-area --partitions 4
+    python manage.py cluster-points --key geohash
+    python manage.py cluster-points --report-only
+"""
+import argparse
+import asyncio
+import logging
+from app.db import engine, async_session
+from app.schemas import ExportTable
+from app.services import export as export_service
+from app.services import spatial as spatial_service
+from app.services import overlaps as overlaps_service
+from app.services import maintenance as maintenance_service
+
+async def run_export(args: argparse.Namespace):
+    """Export a table to GeoParquet files"""
+    written = await export_service.export_table(
+        args.table,
+        args.out,
+        bbox=tuple(args.bbox) if args.bbox else None,
+        batch_size=args.batch_size,
+        partitions=args.partitions,
+    )
+    for path, count in written.items():
+        print(f"{path}: {count} rows")
+
+async def run_rebuild_membership(args: argparse.Namespace):
+    """Rebuild the point-polygon membership table, or only check it against the geometries"""
+    async with async_session() as session:
+        if args.check:
+            missing, stale = await spatial_service.check_memberships(session)
+            print(f"Membership check: {missing} missing, {stale} stale")
+            if missing or stale:
+                raise SystemExit(1)
+            return
+        count = await spatial_service.rebuild_memberships(session)
+        print(f"Rebuilt point-polygon membership: {count} rows")
+
+async def run_overlap_audit(args: argparse.Namespace):
+    """Write all overlapping polygon pairs to a file"""
+    count = await overlaps_service.run_overlap_audit(
+        args.out,
+        output_format=args.format,
+        with_area=args.with_area,
+        partitions=args.partitions,
+        batch_size=args.batch_size,
+    )
+    print(f"{args.out}: {count} overlapping pairs")
+
+async def run_cluster_points(args: argparse.Namespace):
+    """Cluster point storage by a spatial key, ANALYZE, and print the storage health report"""
+    if args.report_only:
+        report = await maintenance_service.get_storage_health()
+    else:
+        report = await maintenance_service.run_storage_maintenance(None if args.analyze_only else args.key)
+        if report is None:
+            print("Storage maintenance is already running in another process")
+            raise SystemExit(1)
+    for line in maintenance_service.format_health_report(report):
+        print(line)
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Spatial Data Platform management commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export a table to GeoParquet")
+    export_parser.add_argument("table", choices=[table.value for table in ExportTable])
+    export_parser.add_argument("--out", required=True, help="Output directory")
+    export_parser.add_argument(
+        "--bbox", nargs=4, type=float, metavar=("MIN_LON", "MIN_LAT", "MAX_LON", "MAX_LAT"),
+        help="Only export geometries intersecting this bounding box",
+    )
+    export_parser.add_argument("--batch-size", type=positive_int, default=None, help="Rows per cursor batch and row group")
+    export_parser.add_argument("--partitions", type=positive_int, default=1, help="Number of id-range partitions to export concurrently")
+    export_parser.set_defaults(handler=run_export)
+
+    membership_parser = subparsers.add_parser(
+        "rebuild-membership", help="Rebuild the point-polygon membership table from the geometries"
+    )
+    membership_parser.add_argument(
+        "--check", action="store_true",
+        help="Only report missing and stale rows, exiting with status 1 if there are any",
+    )
+    membership_parser.set_defaults(handler=run_rebuild_membership)
+
+    overlap_parser = subparsers.add_parser("overlap-audit", help="Find all pairs of overlapping polygons")
+    overlap_parser.add_argument("--out", required=True, help="Output file")
+    overlap_parser.add_argument("--format", choices=overlaps_service.OUTPUT_FORMATS, default="ndjson")
+    overlap_parser.add_argument("--with-area", action="store_true", help="Include the intersection area in square meters")
+    overlap_parser.add_argument("--partitions", type=positive_int, default=1, help="Number of spatial partitions to join concurrently")
+    overlap_parser.add_argument("--batch-size", type=positive_int, default=None, help="Rows per cursor batch")
+    overlap_parser.set_defaults(handler=run_overlap_audit)
+
+    cluster_parser = subparsers.add_parser(
+        "cluster-points", help="Reorder point storage by a spatial key, ANALYZE, and report table health"
+    )
+    cluster_parser.add_argument(
+        "--key", choices=maintenance_service.CLUSTER_KEYS, default="geohash",
+        help="geohash: Z-order curve expression index; gist: the geometry's GiST index",
+    )
+    mode = cluster_parser.add_mutually_exclusive_group()
+    mode.add_argument("--analyze-only", action="store_true", help="Skip the CLUSTER rewrite, only ANALYZE")
+    mode.add_argument("--report-only", action="store_true", help="Only print the health report")
+    cluster_parser.set_defaults(handler=run_cluster_points)
+
+    return parser
+
+async def main(args: argparse.Namespace):
+    try:
+        await args.handler(args)
+    finally:
+        await engine.dispose()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(build_parser().parse_args()))
@@ -0,0 +1,208 @@
+import json
+from types import SimpleNamespace
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from geoalchemy2.shape import from_shape, to_shape
+from shapely import wkb
+from shapely.geometry import Point, Polygon
+from app.routes.fast_json import point_rows_response, polygon_rows_response, ring_coordinates
+from app.schemas import PointResponse, PolygonResponse
+from app.config import settings
+from app.db import get_db
+from app.models import PointDB, PolygonDB
+from app.repository.rows import POINT_ROW_COLUMNS, POLYGON_ROW_COLUMNS
+from main import app
+
+METADATA = [
+    None,
+    {},
+    {"amenity": "cafe", "wifi": True, "rating": 4.5},
+    {"address": {"street": "U St NW", "number": 1811}, "tags": ["bar", {"live": ["jazz", None]}], "score": 1e-07},
+]
+
+POLYGON_RINGS = [
+    [(-77.1, 38.9), (-77.1, 38.8), (-77.0, 38.8), (-77.0, 38.9), (-77.1, 38.9)],
+    [(0.1, 0.2), (10.000000000000002, 0.3), (5.5, -7.123456789), (0.1, 0.2)],
+]
+
+def _body(response) -> list:
+    return json.loads(response.body)
+
+def _model_body(models) -> list:
+    # What FastAPI sends for a response_model=List[...] route
+    return [model.model_dump(mode="json") for model in models]
+
+def _point_rows():
+    """ORM-style point objects and the matching POINT_ROW_COLUMNS tuples"""
+    points, rows = [], []
+    for index, meta in enumerate(METADATA):
+        longitude, latitude = -77.0317 + index / 3, 38.9146 - index / 7
+        points.append(SimpleNamespace(
+            id=index + 1, name=f"Point {index}", geom=from_shape(Point(longitude, latitude), srid=4326), meta=meta
+        ))
+        rows.append((index + 1, f"Point {index}", latitude, longitude, meta))
+    return points, rows
+
+def _polygon_rows():
+    """ORM-style polygon objects and the matching POLYGON_ROW_COLUMNS tuples"""
+    polygons, rows = [], []
+    for index, meta in enumerate(METADATA):
+        shape = Polygon(POLYGON_RINGS[index % len(POLYGON_RINGS)])
+        polygons.append(SimpleNamespace(id=index + 1, name=f"Polygon {index}", geom=from_shape(shape, srid=4326), meta=meta))
+        # ST_AsBinary(ST_ExteriorRing(geom), 'NDR') returns the ring as a little-endian LineString
+        rows.append((index + 1, f"Polygon {index}", wkb.dumps(shape.exterior, byte_order=1), meta))
+    return polygons, rows
+
+def test_ring_coordinates_decodes_little_endian_wkb():
+    for ring in POLYGON_RINGS:
+        shape = Polygon(ring)
+        assert ring_coordinates(wkb.dumps(shape.exterior, byte_order=1)) == list(shape.exterior.coords)
+
+def test_ring_coordinates_accepts_memoryview():
+    shape = Polygon(POLYGON_RINGS[0])
+    assert ring_coordinates(memoryview(wkb.dumps(shape.exterior, byte_order=1))) == list(shape.exterior.coords)
+
+def test_point_rows_match_point_responses():
+    points, rows = _point_rows()
+    models = [
+        PointResponse(
+            id=point.id,
+            name=point.name,
+            latitude=to_shape(point.geom).y,
+            longitude=to_shape(point.geom).x,
+            metadata=point.meta
+        ) for point in points
+    ]
+    assert _body(point_rows_response(rows)) == _model_body(models)
+
+def test_polygon_rows_match_polygon_responses():
+    polygons, rows = _polygon_rows()
+    models = [
+        PolygonResponse(
+            id=polygon.id,
+            name=polygon.name,
+            coordinates=list(to_shape(polygon.geom).exterior.coords),
+            metadata=polygon.meta
+        ) for polygon in polygons
+    ]
+    assert _body(polygon_rows_response(rows)) == _model_body(models)
+
+def test_empty_rows():
+    assert _body(point_rows_response([])) == []
+    assert _body(polygon_rows_response([])) == []
+
+def test_integers_beyond_64_bits_fall_back_to_standard_encoder():
+    meta = {"big": 2 ** 64, "negative": -(2 ** 70)}
+    response = point_rows_response([(1, "Big", 1.0, 2.0, meta)])
+    model = PointResponse(id=1, name="Big", latitude=1.0, longitude=2.0, metadata=meta)
+    assert _body(response) == _model_body([model])
+
+# Route-level checks: the same request with FAST_JSON_RESPONSES on and off, through the real
+# queries, against FastAPI's response_model output. FakeSession answers a row-column select
+# by evaluating each selected column, so a reordered POINT_ROW_COLUMNS or POLYGON_ROW_COLUMNS
+# changes the fast response and fails the comparison.
+
+def _sql(column) -> str:
+    return str(column.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+def _ring_wkb(polygon) -> bytes:
+    return wkb.dumps(to_shape(polygon.geom).exterior, byte_order=1)
+
+COLUMN_VALUES = {
+    "points.id": lambda point: point.id,
+    "points.name": lambda point: point.name,
+    "ST_Y(points.geom)": lambda point: to_shape(point.geom).y,
+    "ST_X(points.geom)": lambda point: to_shape(point.geom).x,
+    "points.meta": lambda point: point.meta,
+    "polygons.id": lambda polygon: polygon.id,
+    "polygons.name": lambda polygon: polygon.name,
+    "ST_AsBinary(ST_ExteriorRing(polygons.geom), 'NDR')": _ring_wkb,
+    "polygons.meta": lambda polygon: polygon.meta,
+}
+
+class FakeResult:
+    def __init__(self, values):
+        self._values = values
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return list(self._values)
+
+    def first(self):
+        return self._values[0] if self._values else None
+
+    def scalar(self):
+        value = self.first()
+        return value[0] if isinstance(value, tuple) else value
+
+class FakeSession:
+    """Answers every select with all stored points or polygons, ignoring filters"""
+
+    def __init__(self):
+        self.points = [
+            PointDB(
+                id=index + 1,
+                name=f"Point {index}",
+                geom=from_shape(Point(-77.0317 + index / 3, 38.9146 - index / 7), srid=4326),
+                meta=meta
+            ) for index, meta in enumerate(METADATA)
+        ]
+        self.polygons = [
+            PolygonDB(
+                id=index + 1,
+                name=f"Polygon {index}",
+                geom=from_shape(Polygon(POLYGON_RINGS[index % len(POLYGON_RINGS)]), srid=4326),
+                meta=meta
+            ) for index, meta in enumerate(METADATA)
+        ]
+
+    async def execute(self, query):
+        descriptions = query.column_descriptions
+        entity = descriptions[0]["expr"]
+        if len(descriptions) == 1 and (entity is PointDB or entity is PolygonDB):
+            return FakeResult(self.points if entity is PointDB else self.polygons)
+        records = self.points if descriptions[0]["entity"] is PointDB else self.polygons
+        columns = [_sql(column) for column in query.selected_columns]
+        return FakeResult([tuple(COLUMN_VALUES[column](record) for column in columns) for record in records])
+
+    async def close(self):
+        pass
+
+@pytest.fixture
+def client():
+    async def get_fake_db():
+        yield FakeSession()
+
+    app.dependency_overrides[get_db] = get_fake_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+@pytest.mark.parametrize("path", [
+    "/points/",
+    "/polygons/",
+    "/spatial/points-in-polygon/1",
+    "/spatial/points-near/1/1000",
+    "/spatial/polygons-containing-point/1",
+    "/spatial/overlapping-polygons/1",
+])
+def test_fast_responses_match_response_model(client, monkeypatch, path):
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", False)
+    standard = client.get(path)
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+    fast = client.get(path)
+    assert standard.status_code == fast.status_code == 200
+    assert standard.json()
+    assert fast.json() == standard.json()
+
+def test_row_columns_order():
+    # The order point_rows_response and polygon_rows_response unpack rows in
+    assert [_sql(column) for column in select(PointDB).with_only_columns(*POINT_ROW_COLUMNS).selected_columns] == [
+        "points.id", "points.name", "ST_Y(points.geom)", "ST_X(points.geom)", "points.meta"
+    ]
+    assert [_sql(column) for column in select(PolygonDB).with_only_columns(*POLYGON_ROW_COLUMNS).selected_columns] == [
+        "polygons.id", "polygons.name", "ST_AsBinary(ST_ExteriorRing(polygons.geom), 'NDR')", "polygons.meta"
+    ]